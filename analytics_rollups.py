@@ -0,0 +1,181 @@
+"""Hourly and daily rollups of conversation_analytics for the admin dashboard
+
+Triggers keep the rollups current as analytics rows are inserted, updated
+(e.g. rated) or deleted, so the dashboard reads a few hundred summary rows
+instead of aggregating the raw log. To rebuild them from the raw rows
+(after a restore or a manual edit) run:
+
+    python analytics_rollups.py [database]
+"""
+import sqlite3
+import sys
+
+DEFAULT_DATABASE = 'inquiries.db'
+
+# Measures kept per time bucket: sums and counts, so averages stay exact
+ROLLUP_COLUMNS = '''
+    conversations INTEGER NOT NULL DEFAULT 0,
+    confidence_sum REAL NOT NULL DEFAULT 0,
+    confidence_count INTEGER NOT NULL DEFAULT 0,
+    response_time_sum REAL NOT NULL DEFAULT 0,
+    response_time_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0
+'''
+
+# bucket expression for each time rollup table, given a row prefix (NEW/OLD)
+TIME_ROLLUPS = {
+    'analytics_hourly': "STRFTIME('%Y-%m-%d %H:00:00', COALESCE({row}.timestamp, CURRENT_TIMESTAMP))",
+    'analytics_daily': 'DATE(COALESCE({row}.timestamp, CURRENT_TIMESTAMP))'
+}
+
+# (table, key column, source column) of the per-day dimension counts.
+# NULL is stored as '' so it can be part of the primary key.
+DIMENSION_ROLLUPS = [
+    ('analytics_intent_daily', 'intent', 'intent'),
+    ('analytics_language_daily', 'language', 'detected_language')
+]
+
+
+def _tables():
+    statements = [f'CREATE TABLE IF NOT EXISTS {table} (bucket TEXT PRIMARY KEY, {ROLLUP_COLUMNS}) WITHOUT ROWID'
+                  for table in TIME_ROLLUPS]
+    for table, key, _ in DIMENSION_ROLLUPS:
+        statements.append(f'''CREATE TABLE IF NOT EXISTS {table} (
+            day TEXT NOT NULL,
+            {key} TEXT NOT NULL,
+            conversations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, {key})
+        ) WITHOUT ROWID''')
+    return statements
+
+
+def _apply(row, sign):
+    """Statements adding (sign 1) or removing (sign -1) one analytics row from every rollup"""
+    statements = []
+    for table, bucket in TIME_ROLLUPS.items():
+        statements.append(f'''
+        INSERT INTO {table} (bucket, conversations, confidence_sum, confidence_count,
+                             response_time_sum, response_time_count, rating_sum, rating_count)
+        VALUES ({bucket.format(row=row)}, {sign},
+                {sign} * COALESCE({row}.confidence, 0), {sign} * ({row}.confidence IS NOT NULL),
+                {sign} * COALESCE({row}.response_time, 0), {sign} * ({row}.response_time IS NOT NULL),
+                {sign} * COALESCE({row}.user_rating, 0), {sign} * ({row}.user_rating IS NOT NULL))
+        ON CONFLICT(bucket) DO UPDATE SET
+            conversations = conversations + excluded.conversations,
+            confidence_sum = confidence_sum + excluded.confidence_sum,
+            confidence_count = confidence_count + excluded.confidence_count,
+            response_time_sum = response_time_sum + excluded.response_time_sum,
+            response_time_count = response_time_count + excluded.response_time_count,
+            rating_sum = rating_sum + excluded.rating_sum,
+            rating_count = rating_count + excluded.rating_count;''')
+    day = TIME_ROLLUPS['analytics_daily'].format(row=row)
+    for table, key, source in DIMENSION_ROLLUPS:
+        statements.append(f'''
+        INSERT INTO {table} (day, {key}, conversations) VALUES ({day}, COALESCE({row}.{source}, ''), {sign})
+        ON CONFLICT(day, {key}) DO UPDATE SET conversations = conversations + excluded.conversations;''')
+    return ''.join(statements)
+
+
+def _triggers():
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS analytics_rollup_insert AFTER INSERT ON conversation_analytics BEGIN
+            {_apply('NEW', 1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS analytics_rollup_update
+        AFTER UPDATE OF timestamp, intent, confidence, detected_language, response_time, user_rating
+        ON conversation_analytics BEGIN
+            {_apply('OLD', -1)}
+            {_apply('NEW', 1)}
+        END''',
+        f'''CREATE TRIGGER IF NOT EXISTS analytics_rollup_delete AFTER DELETE ON conversation_analytics BEGIN
+            {_apply('OLD', -1)}
+        END'''
+    ]
+
+
+def create_schema(conn):
+    """Create the rollup tables and triggers and fill them from existing rows"""
+    for statement in _tables() + _triggers():
+        conn.execute(statement)
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute every rollup from conversation_analytics (caller commits)"""
+    for table, bucket in TIME_ROLLUPS.items():
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f'''
+            INSERT INTO {table} (bucket, conversations, confidence_sum, confidence_count,
+                                 response_time_sum, response_time_count, rating_sum, rating_count)
+            SELECT {bucket.format(row='conversation_analytics')} AS b, COUNT(*),
+                   TOTAL(confidence), COUNT(confidence),
+                   TOTAL(response_time), COUNT(response_time),
+                   TOTAL(user_rating), COUNT(user_rating)
+            FROM conversation_analytics GROUP BY b
+        ''')
+    day = TIME_ROLLUPS['analytics_daily'].format(row='conversation_analytics')
+    for table, key, source in DIMENSION_ROLLUPS:
+        conn.execute(f'DELETE FROM {table}')
+        conn.execute(f'''
+            INSERT INTO {table} (day, {key}, conversations)
+            SELECT {day} AS d, COALESCE({source}, '') AS k, COUNT(*) FROM conversation_analytics GROUP BY d, k
+        ''')
+
+
+def dashboard_summary(conn, trend_days=7, top_intents=10):
+    """Everything the analytics dashboard shows about conversations, from the rollups"""
+    totals = conn.execute('''
+        SELECT TOTAL(conversations) AS conversations,
+               TOTAL(confidence_sum) / NULLIF(TOTAL(confidence_count), 0) AS avg_confidence,
+               TOTAL(response_time_sum) / NULLIF(TOTAL(response_time_count), 0) AS avg_response_time,
+               TOTAL(rating_sum) / NULLIF(TOTAL(rating_count), 0) AS avg_rating
+        FROM analytics_daily
+    ''').fetchone()
+    intents = conn.execute('''
+        SELECT intent, SUM(conversations) AS count FROM analytics_intent_daily
+        WHERE intent != '' GROUP BY intent HAVING count > 0 ORDER BY count DESC LIMIT ?
+    ''', (top_intents,)).fetchall()
+    languages = conn.execute('''
+        SELECT NULLIF(language, '') AS language, SUM(conversations) AS count FROM analytics_language_daily
+        GROUP BY language HAVING count > 0
+    ''').fetchall()
+    daily = conn.execute('''
+        SELECT bucket AS date, conversations AS count FROM analytics_daily
+        WHERE bucket >= DATE('now', ?) AND conversations > 0 ORDER BY bucket
+    ''', (f'-{int(trend_days)} days',)).fetchall()
+    hourly = conn.execute('''
+        SELECT bucket AS hour, conversations AS count FROM analytics_hourly
+        WHERE bucket >= STRFTIME('%Y-%m-%d %H:00:00', 'now', '-23 hours') AND conversations > 0 ORDER BY bucket
+    ''').fetchall()
+    return {
+        'total_conversations': int(totals['conversations']),
+        'avg_confidence': totals['avg_confidence'],
+        'avg_response_time': totals['avg_response_time'],
+        'avg_rating': totals['avg_rating'],
+        'top_intents': [(row['intent'], row['count']) for row in intents],
+        'language_dist': [(row['language'], row['count']) for row in languages],
+        'daily_trend': [(row['date'], row['count']) for row in daily],
+        'hourly_trend': [(row['hour'], row['count']) for row in hourly]
+    }
+
+
+def rebuild_database(path=DEFAULT_DATABASE):
+    """Rebuild the analytics rollups and the FAQ per-intent summary in `path`"""
+    from schema import rebuild_faq_summary
+
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute('BEGIN IMMEDIATE')  # hold off writers so no trigger update is lost
+        rebuild(conn)
+        rebuild_faq_summary(conn)
+        conn.commit()
+        days, conversations = conn.execute(
+            'SELECT COUNT(*), TOTAL(conversations) FROM analytics_daily').fetchone()
+        print(f'Rebuilt rollups: {int(conversations)} conversations over {days} days')
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    rebuild_database(*sys.argv[1:2])
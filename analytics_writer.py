@@ -0,0 +1,138 @@
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class AnalyticsWriter:
+    """Write-behind queue for analytics rows
+
+    submit() only appends (kind, row) to a bounded queue, so the request
+    never waits on SQLite. A background thread collects rows until it has
+    batch_size of them or flush_interval seconds have passed since the first
+    one, then hands each kind's rows to its handler(conn, rows) and commits
+    them all in one transaction. After the commit each kind's
+    after_commit(rows) callback, if any, runs (e.g. to patch cached counts,
+    which must not see rows a rollback discarded). When the queue is full
+    new rows are dropped and counted, never blocked on. close() (registered
+    with atexit by the app) writes out whatever is still queued.
+    """
+
+    def __init__(self, connection, handlers, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 after_commit=None):
+        self.connection = connection
+        self.handlers = handlers
+        self.after_commit = after_commit or {}
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(max_queue)
+        self._thread = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = {kind: 0 for kind in handlers}
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_flush_ms = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='analytics-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, kind, row):
+        """Queue one row for the `kind` handler; False if it had to be dropped"""
+        try:
+            self._queue.put_nowait((kind, row))
+        except queue.Full:
+            self.dropped[kind] += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = self.flush_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+        # Shutting down: write out whatever was queued behind the stop marker
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        start = time.perf_counter()
+        by_kind = {}
+        for kind, row in batch:
+            by_kind.setdefault(kind, []).append(row)
+        try:
+            with self.connection() as conn:
+                for kind, rows in by_kind.items():
+                    self.handlers[kind](conn, rows)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            print(f"Error writing analytics batch of {len(batch)} rows: {e}")
+            return
+        for kind, rows in by_kind.items():
+            callback = self.after_commit.get(kind)
+            if callback is None:
+                continue
+            try:
+                callback(rows)
+            except Exception as e:
+                print(f"Error after writing {kind} analytics rows: {e}")
+        self.written += len(batch)
+        self.batches += 1
+        self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    def close(self, timeout=5.0):
+        """Stop the writer after flushing everything queued so far"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize(),
+            'max_queue': self.max_queue,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': dict(self.dropped),
+            'batches': self.batches,
+            'avg_batch_size': round(self.written / self.batches, 2) if self.batches else 0,
+            'last_flush_ms': self.last_flush_ms,
+            'errors': self.errors,
+            'last_error': self.last_error
+        }
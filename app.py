@@ -1,17 +1,30 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, send_file, Response, send_from_directory
 import random
 import json
-import torch
-from model import NeuralNet
-from nltk_utils import bag_of_words, tokenize
+from inference import load_classifier, validate_classifier, ModelBundle, MicroBatcher
+from nltk_utils import tokenize, set_tokenizer_mode, preload_stems, stem_cache_stats, normalize_question
+from message_analysis import MessageAnalyzer
+from spell import SpellCorrector
+from holiday_calendar import HolidayCalendar
+from session_store import ConversationStore
+from analytics_writer import AnalyticsWriter
+from database import ConnectionPool
+from schema import create_schema
+from analytics_rollups import dashboard_summary
+from search import IntentSearchIndex, inquiry_search
+from pagination import keyset_page, offset_page, page_limit, parse_cursor, parse_offset
+from cache import QueryCache
+from export import EXPORT_FORMATS, export_rows, select_columns, encode_export
+from retrain import RetrainQueue, RETRAIN_SCRIPT
 from datetime import datetime, timedelta
 import secrets
 import sqlite3
 import os
-import csv
-import io
 import re
 import sys
+import threading
+import time
+import atexit
 import requests
 from urllib.parse import quote
 
@@ -23,26 +36,123 @@ app = Flask(__name__,
             static_folder='static')
 app.secret_key = secrets.token_hex(16)  # For session management
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# Precompiled regex tokenizer: same bag-of-words as nltk.word_tokenize on the
+# intents corpus (see benchmark.py tokenizer) without loading punkt
+TOKENIZER_MODE = 'regex'
+set_tokenizer_mode(TOKENIZER_MODE)
 
-# Load the Kalapuraparambil Automobiles intents
-with open('kalapuraparambil_intents.json', 'r', encoding='utf-8') as json_data:
-    intents = json.load(json_data)
-
-# Load the trained model
+# Load the trained model. The 'numpy' backend serves the bundle written by
+# export_model.py without importing torch; it falls back to the .pth file.
 FILE = "kalapuraparambil_data.pth"
-data = torch.load(FILE, map_location=torch.device('cpu'))
-
-input_size = data["input_size"]
-hidden_size = data["hidden_size"]
-output_size = data["output_size"]
-all_words = data['all_words']
-tags = data['tags']
-model_state = data["model_state"]
+NUMPY_FILE = "kalapuraparambil_data.npz"
+INTENTS_FILE = 'kalapuraparambil_intents.json'
+INFERENCE_BACKEND = 'numpy'
+
+# Prediction cache in front of the classifier (entries, seconds). Keys are the
+# in-vocabulary stems of a message, so repeated phrasing skips the forward pass.
+PREDICTION_CACHE_SIZE = 4096
+PREDICTION_CACHE_TTL = 3600
+
+# Hot reload: poll the model and intents files every MODEL_WATCH_INTERVAL
+# seconds (0 disables) and reload once they have been untouched for
+# MODEL_RELOAD_SETTLE seconds. /admin/reload-model triggers a reload directly.
+MODEL_WATCH_INTERVAL = 5
+MODEL_RELOAD_SETTLE = 2
+
+def model_files_version():
+    """Modification times of every file a model bundle is built from"""
+    version = []
+    for path in (FILE, NUMPY_FILE, INTENTS_FILE):
+        try:
+            version.append((path, os.stat(path).st_mtime_ns))
+        except FileNotFoundError:
+            pass
+    return tuple(version)
+
+def load_model_bundle():
+    """Load intents and model from disk into a new, validated ModelBundle"""
+    version = model_files_version()
+    with open(INTENTS_FILE, 'r', encoding='utf-8') as json_data:
+        intents_data = json.load(json_data)
+    classifier = load_classifier(FILE, NUMPY_FILE, INFERENCE_BACKEND,
+                                 cache_size=PREDICTION_CACHE_SIZE,
+                                 cache_ttl=PREDICTION_CACHE_TTL)
+    validate_classifier(classifier, intents_data)
+    return ModelBundle(classifier, intents_data, build_response_catalog(intents_data),
+                       build_spell_corrector(intents_data, classifier.all_words), IntentSearchIndex(intents_data),
+                       version, datetime.now().isoformat())
+
+model_swap_lock = threading.Lock()
+model_reload_lock = threading.Lock()
+model_reload_status = {
+    'state': 'idle',
+    'last_reload': None,
+    'last_error': None,
+    'failed_version': None
+}
 
-model = NeuralNet(input_size, hidden_size, output_size).to(device)
-model.load_state_dict(model_state)
-model.eval()
+def reload_model():
+    """Load a new bundle, validate it and swap it in; False if a reload is already running"""
+    global model_bundle
+    if not model_reload_lock.acquire(blocking=False):
+        return False
+    try:
+        model_reload_status['state'] = 'loading'
+        new_bundle = load_model_bundle()
+        with model_swap_lock:
+            model_bundle = new_bundle
+        model_reload_status.update(last_reload=new_bundle.loaded_at, last_error=None, failed_version=None)
+        print(f"✅ Model reloaded: {len(new_bundle.classifier.tags)} tags, {len(new_bundle.classifier.all_words)} words")
+    except Exception as e:
+        model_reload_status.update(last_error=str(e), failed_version=model_files_version())
+        print(f"Error reloading model, keeping the current one: {e}")
+    finally:
+        model_reload_status['state'] = 'idle'
+        model_reload_lock.release()
+    return True
+
+def update_bundle_intents(intents_data):
+    """Swap in edited intents while keeping the loaded model"""
+    global model_bundle
+    with model_swap_lock:
+        model_bundle = model_bundle._replace(intents=intents_data,
+                                             catalog=build_response_catalog(intents_data),
+                                             speller=build_spell_corrector(intents_data, model_bundle.classifier.all_words),
+                                             search=IntentSearchIndex(intents_data),
+                                             version=model_files_version())
+
+def watch_model_files():
+    """Background loop reloading the model when its files change on disk"""
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        version = model_files_version()
+        if version == model_bundle.version or version == model_reload_status['failed_version']:
+            continue
+        newest = max(mtime for _, mtime in version) / 1e9
+        if time.time() - newest < MODEL_RELOAD_SETTLE:
+            continue  # still being written
+        reload_model()
+
+# Micro-batching: hold concurrent /chat predictions for a short window and
+# run them through the network together. Off by default; below
+# MICRO_BATCH_BYPASS_BELOW concurrent requests predictions run inline.
+MICRO_BATCHING_ENABLED = False
+MICRO_BATCH_WINDOW_MS = 2.0
+MICRO_BATCH_MAX_SIZE = 32
+MICRO_BATCH_BYPASS_BELOW = 2
+
+if MICRO_BATCHING_ENABLED:
+    micro_batcher = MicroBatcher(window_ms=MICRO_BATCH_WINDOW_MS,
+                                 max_batch_size=MICRO_BATCH_MAX_SIZE,
+                                 bypass_below=MICRO_BATCH_BYPASS_BELOW)
+else:
+    micro_batcher = None
+
+def predict_intent(classifier, sentence):
+    """Return (tag, confidence), through the micro-batcher when enabled"""
+    if micro_batcher is not None:
+        return micro_batcher.predict(classifier, sentence)
+    return classifier.predict(sentence)
 
 bot_name = "Kalapuraparambil Auto Bot"
 
@@ -63,16 +173,63 @@ HIGH_CONFIDENCE = 0.85
 MEDIUM_CONFIDENCE = 0.75
 LOW_CONFIDENCE = 0.50
 
+# Upper bound on messages accepted by /chat/batch in one request
+CHAT_BATCH_LIMIT = 500
+
 # Database setup
 DATABASE = 'inquiries.db'
-
-# Install textdistance for spell checking if not available
-try:
-    from textdistance import levenshtein
-    SPELL_CHECK_ENABLED = True
-except ImportError:
-    SPELL_CHECK_ENABLED = False
-    print("Warning: textdistance not installed. Spell checking disabled.")
+DB_POOL_SIZE = 8
+
+# Seconds between checks of the holidays version row; edits made through this
+# process are visible immediately, other workers pick them up within this.
+HOLIDAY_POLL_INTERVAL = 30
+
+# Server-side chat sessions: the cookie only carries session_id. Turns kept
+# per session, idle seconds before a session expires, cached sessions.
+SESSION_MAX_TURNS = 50
+SESSION_IDLE_TIMEOUT = 24 * 3600
+SESSION_CACHE_SIZE = 2048
+SESSION_PURGE_INTERVAL = 600
+HISTORY_PAGE_SIZE = 20
+
+# Write-behind analytics: rows queued by /chat (dropped when the queue is
+# full) and group-committed by a background thread per batch or interval
+ANALYTICS_QUEUE_SIZE = 10000
+ANALYTICS_BATCH_SIZE = 500
+ANALYTICS_FLUSH_INTERVAL = 1.0
+
+# Spell checking corrects words to the intents vocabulary (see spell.py)
+SPELL_CHECK_ENABLED = True
+SPELL_CACHE_SIZE = 4096
+
+# Common misspellings in automobile context; these win over the fuzzy match
+SPELL_OVERRIDES = {
+    'carvan': 'caravan',
+    'carvans': 'caravans',
+    'urbania': 'urbania',  # Keep as is
+    'travler': 'traveller',
+    'traveller': 'traveller',
+    'modifikation': 'modification',
+    'modifcation': 'modification',
+    'custm': 'custom',
+    'luxry': 'luxury',
+    'prise': 'price',
+    'prising': 'pricing',
+    'ambulence': 'ambulance',
+    'vehical': 'vehicle',
+    'vehicel': 'vehicle',
+    'interier': 'interior',
+    'intrior': 'interior',
+    'servises': 'services',
+    'servis': 'service',
+    'contakt': 'contact',
+    'cntact': 'contact',
+    'wurkshop': 'workshop',
+    'qoute': 'quote',
+    'quation': 'quotation',
+    'timline': 'timeline',
+    'costm': 'custom',
+}
 
 # Gallery images organized by category
 GALLERY_IMAGES = {
@@ -122,96 +279,62 @@ GALLERY_IMAGES = {
     ]
 }
 
-def get_db_connection():
-    """Create database connection with timeout to prevent locks"""
-    conn = sqlite3.connect(DATABASE, timeout=10.0)
-    conn.row_factory = sqlite3.Row
-    # Enable WAL mode for better concurrent access
-    conn.execute('PRAGMA journal_mode=WAL')
-    return conn
+# Pooled connections with WAL and the other PRAGMAs applied once per
+# connection (see database.py); use `with db.connection() as conn:`
+db = ConnectionPool(DATABASE, DB_POOL_SIZE)
 
 def init_db():
-    """Initialize database with inquiries table"""
-    conn = get_db_connection()
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS inquiries (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone TEXT NOT NULL,
-            email TEXT,
-            service TEXT NOT NULL,
-            message TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            status TEXT DEFAULT 'new',
-            priority TEXT DEFAULT 'medium',
-            tags TEXT DEFAULT '',
-            notes TEXT DEFAULT '',
-            follow_up_date DATE,
-            assigned_to TEXT
-        )
-    ''')
-    
-    # Create conversation analytics table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS conversation_analytics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT NOT NULL,
-            user_message TEXT NOT NULL,
-            bot_response TEXT NOT NULL,
-            intent TEXT,
-            confidence REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            user_rating INTEGER,
-            detected_language TEXT,
-            response_time REAL
-        )
-    ''')
-    
-    # Create FAQ learning table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS faq_patterns (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            original_question TEXT NOT NULL,
-            normalized_question TEXT NOT NULL,
-            intent TEXT NOT NULL,
-            frequency INTEGER DEFAULT 1,
-            last_asked DATETIME DEFAULT CURRENT_TIMESTAMP,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create admin users table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS admin_users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL
-        )
-    ''')
-    
-    # Create holidays table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS holidays (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date DATE UNIQUE NOT NULL,
-            name TEXT NOT NULL,
-            description TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create default admin if doesn't exist
-    try:
-        conn.execute("INSERT INTO admin_users (username, password) VALUES (?, ?)", ('admin', 'admin123'))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        pass  # Admin already exists
-    
-    conn.close()
+    """Create the tables and apply pending migrations (see schema.py)"""
+    with db.connection() as conn:
+        create_schema(conn)
+        
+        # Create default admin if doesn't exist
+        try:
+            conn.execute("INSERT INTO admin_users (username, password) VALUES (?, ?)", ('admin', 'admin123'))
+            conn.commit()
+        except sqlite3.IntegrityError:
+            pass  # Admin already exists
 
 # Initialize database when app starts
 init_db()
 
+# Background retraining: edits in the training-data editor queue a run of
+# retrain.py in a separate process. Edits within RETRAIN_DELAY seconds of
+# each other share one run, whichever worker they reach; jobs are kept in
+# the retrain_jobs table and one run at a time trains across all workers.
+# A published model is swapped in right away by the worker that ran it and
+# by the model file watcher in the others.
+RETRAIN_ON_EDIT = True
+RETRAIN_DELAY = 5
+
+retrain_queue = RetrainQueue([sys.executable, '-u', RETRAIN_SCRIPT, '--tokenizer', TOKENIZER_MODE],
+                             db.connection, on_publish=reload_model, delay=RETRAIN_DELAY)
+atexit.register(retrain_queue.close)
+
+def schedule_retrain(reason):
+    """Queue a retrain after an intents edit; the job, or None when disabled"""
+    if not RETRAIN_ON_EDIT:
+        return None
+    return retrain_queue.request(reason)
+
+def edit_response(message, job):
+    if job is None:
+        return jsonify({'status': 'success', 'message': f'{message} Please retrain the model for changes to take effect.'})
+    return jsonify({
+        'status': 'success',
+        'message': f'{message} The model is retraining in the background.',
+        'retrain_job': job['id']
+    })
+
+# Holidays are served from memory; the chat path never queries the table
+holiday_calendar = HolidayCalendar(db.connection, HOLIDAY_POLL_INTERVAL)
+holiday_calendar.reload()
+holiday_calendar.start()
+
+conversation_store = ConversationStore(db.connection, SESSION_MAX_TURNS, SESSION_IDLE_TIMEOUT,
+                                       SESSION_CACHE_SIZE, purge_interval=SESSION_PURGE_INTERVAL)
+conversation_store.start()
+
 # Validation functions
 def validate_phone(phone):
     """Validate Indian phone number"""
@@ -275,122 +398,109 @@ def format_response(response, tag):
     
     return response
 
-def spell_check_message(message):
-    """Basic spell check and auto-correction for common patterns"""
+# Extra text appended to responses, and the intents that get a WhatsApp link
+TIP_TEXT = "\n\n💡 Tip: You can also click the chat bubble to ask more questions!"
+TIP_INTENTS = ['contact', 'location', 'working_hours']
+IMAGE_HINT_TEXT = "\n\n📸 Want to see examples? Just ask 'show me images' or 'show photos'!"
+IMAGE_HINT_INTENTS = ['force_urbania', 'caravan', 'force_traveller', 'special_purpose', 'luxury_interior']
+WHATSAPP_INTENTS = ['contact', 'location', 'working_hours', 'goodbye']
+
+def decorate_response(response, tag):
+    """Format a response and append the tip / image hint its intent gets"""
+    response = format_response(response, tag)
+    if tag in TIP_INTENTS:
+        response += TIP_TEXT
+    if tag in IMAGE_HINT_INTENTS:
+        response += IMAGE_HINT_TEXT
+    return response
+
+def build_response_catalog(intents_data):
+    """Map each tag to its ready-to-serve responses, suggestions and WhatsApp link"""
+    catalog = {}
+    for intent in intents_data['intents']:
+        tag = intent['tag']
+        if tag in catalog:
+            continue  # the first intent with a tag answers, as before
+        catalog[tag] = {
+            'responses': [decorate_response(r, tag) for r in intent['responses']],
+            'suggestions': QUICK_REPLIES.get(tag, QUICK_REPLIES['default']),
+            'whatsapp_link': 'https://wa.me/918148145706?text=' + quote(f"Hi, I'm interested in {tag.replace('_', ' ')}")
+                             if tag in WHATSAPP_INTENTS else None
+        }
+    return catalog
+
+def build_spell_corrector(intents_data, all_words):
+    """Fuzzy spell corrector over the intent pattern words the model knows"""
+    return SpellCorrector.from_intents(intents_data, SPELL_OVERRIDES, all_words, cache_size=SPELL_CACHE_SIZE)
+
+def spell_check_message(message, speller=None):
+    """Correct misspelled words to the closest vocabulary word (edit distance <= 2)"""
     if not SPELL_CHECK_ENABLED:
         return message
-    
-    # Common misspellings in automobile context
-    corrections = {
-        'carvan': 'caravan',
-        'carvans': 'caravans',
-        'urbania': 'urbania',  # Keep as is
-        'travler': 'traveller',
-        'traveller': 'traveller',
-        'modifikation': 'modification',
-        'modifcation': 'modification',
-        'custm': 'custom',
-        'luxry': 'luxury',
-        'prise': 'price',
-        'prising': 'pricing',
-        'ambulence': 'ambulance',
-        'vehical': 'vehicle',
-        'vehicel': 'vehicle',
-        'interier': 'interior',
-        'intrior': 'interior',
-        'servises': 'services',
-        'servis': 'service',
-        'contakt': 'contact',
-        'cntact': 'contact',
-        'wurkshop': 'workshop',
-        'qoute': 'quote',
-        'quation': 'quotation',
-        'timline': 'timeline',
-        'costm': 'custom',
-    }
-    
-    words = message.lower().split()
-    corrected_words = []
-    
-    for word in words:
-        # Remove punctuation for checking
-        clean_word = word.strip('.,!?;:')
-        if clean_word in corrections:
-            # Preserve original case
-            if word[0].isupper():
-                corrected = corrections[clean_word].capitalize()
-            else:
-                corrected = corrections[clean_word]
-            corrected_words.append(word.replace(clean_word, corrected))
-        else:
-            corrected_words.append(word)
-    
-    return ' '.join(corrected_words)
+    return (speller or model_bundle.speller).correct_message(message)
 
-def extract_context_from_session():
-    """Extract context from previous conversation"""
-    if 'conversation' not in session or not session['conversation']:
-        return {}
-    
-    context = {
-        'last_intent': session.get('last_intent'),
-        'last_user_message': None,
-        'last_bot_response': None,
-        'mentioned_topics': set(),
-        'conversation_length': len(session['conversation'])
-    }
-    
-    # Get last 3 messages for context
-    recent_messages = session['conversation'][-6:] if len(session['conversation']) >= 6 else session['conversation']
-    
-    for msg in recent_messages:
-        if msg['role'] == 'user':
-            context['last_user_message'] = msg['message']
-            # Extract topics
-            message_lower = msg['message'].lower()
-            if 'urbania' in message_lower:
-                context['mentioned_topics'].add('force_urbania')
-            if 'caravan' in message_lower:
-                context['mentioned_topics'].add('caravan')
-            if 'traveller' in message_lower:
-                context['mentioned_topics'].add('force_traveller')
-            if 'price' in message_lower or 'cost' in message_lower:
-                context['mentioned_topics'].add('pricing')
-        elif msg['role'] == 'bot':
-            context['last_bot_response'] = msg['message']
-    
-    context['mentioned_topics'] = list(context['mentioned_topics'])
-    return context
+def utc_timestamp():
+    """Current time in the format of SQLite's CURRENT_TIMESTAMP"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
 
 def learn_from_question(user_message, intent, confidence):
-    """Learn from frequently asked questions - async/deferred to improve response time"""
-    try:
-        # Skip learning to reduce latency - can be enabled for production analytics
-        pass
-    except Exception as e:
-        print(f"Error in FAQ learning: {e}")
+    """Learn from frequently asked questions - queued for the analytics writer"""
+    analytics_writer.submit('faq', (user_message, intent, utc_timestamp()))
 
 def log_conversation(session_id, user_message, bot_response, intent, confidence, detected_language, response_time):
-    """Log conversation for analytics - async/deferred to improve response time"""
-    try:
-        # Skip logging to reduce latency - can be enabled for production analytics
-        pass
-    except Exception as e:
-        print(f"Error logging conversation: {e}")
+    """Log conversation for analytics - queued for the analytics writer"""
+    analytics_writer.submit('conversation', (session_id, user_message, bot_response, intent, confidence,
+                                             detected_language, response_time, utc_timestamp()))
+
+def write_conversations(conn, rows):
+    conn.executemany('''
+        INSERT INTO conversation_analytics
+            (session_id, user_message, bot_response, intent, confidence, detected_language, response_time, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+
+def conversations_written(rows):
+    # Only after the batch committed, so a rollback never inflates the cached count
+    query_cache.update('conversation_count', lambda key, counts: dict(counts, count=counts['count'] + len(rows)))
+
+def write_faq_questions(conn, rows):
+    # Collapse repeats of a question within the batch into one upsert
+    collapsed = {}
+    for original, intent, asked_at in rows:
+        normalized = normalize_question(original)
+        if not normalized:
+            continue
+        entry = collapsed.get(normalized)
+        if entry is None:
+            collapsed[normalized] = [original, normalized, intent, 1, asked_at, asked_at]
+        else:
+            entry[2] = intent
+            entry[3] += 1
+            entry[4] = asked_at
+    conn.executemany('''
+        INSERT INTO faq_patterns (original_question, normalized_question, intent, frequency, last_asked, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(normalized_question) DO UPDATE SET
+            frequency = frequency + excluded.frequency,
+            intent = excluded.intent,
+            last_asked = excluded.last_asked
+    ''', list(collapsed.values()))
+
+analytics_writer = AnalyticsWriter(db.connection, {
+    'conversation': write_conversations,
+    'faq': write_faq_questions
+}, ANALYTICS_QUEUE_SIZE, ANALYTICS_BATCH_SIZE, ANALYTICS_FLUSH_INTERVAL, after_commit={
+    'conversation': conversations_written
+})
+analytics_writer.start()
+atexit.register(analytics_writer.close)
+
+# Keyword and script detection for /chat, compiled once (see message_analysis.py)
+message_analyzer = MessageAnalyzer()
 
 def detect_language(text):
-    """Detect language of user input using simple heuristics"""
-    # Check for specific language characters
-    if any('\u0D00' <= c <= '\u0D7F' for c in text):  # Malayalam
-        return 'ml'
-    elif any('\u0B80' <= c <= '\u0BFF' for c in text):  # Tamil
-        return 'ta'
-    elif any('\u0C80' <= c <= '\u0CFF' for c in text):  # Kannada
-        return 'kn'
-    elif any('\u0900' <= c <= '\u097F' for c in text):  # Hindi/Devanagari
-        return 'hi'
-    else:
-        return 'en'  # Default to English
+    """Detect language of user input from its script (Malayalam, Tamil, Kannada, Hindi)"""
+    return message_analyzer.language(text)
 
 def translate_text(text, target_lang='en', source_lang='en'):
     """Translate text using Google Translate API - disabled for performance"""
@@ -398,6 +508,15 @@ def translate_text(text, target_lang='en', source_lang='en'):
     # Re-enable if multilingual support is critical
     return text
 
+# Load the model bundle when app starts. Requests read it once and use that
+# snapshot throughout; reloads replace it with a single assignment, so no
+# request ever mixes model, vocab and intents.
+model_bundle = load_model_bundle()
+preload_stems(model_bundle.intents)
+
+if MODEL_WATCH_INTERVAL:
+    threading.Thread(target=watch_model_files, name='model-watcher', daemon=True).start()
+
 @app.route('/')
 def index():
     response = render_template('index.html')
@@ -597,20 +716,18 @@ def send_contact():
         method = data.get('method', 'email')
         
         # Save message to database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Use email as phone if email is provided, otherwise use 'Not provided'
-        phone = email if email else 'Not provided'
-        service = 'Portfolio Contact'
-        
-        cursor.execute('''
-            INSERT INTO inquiries (name, phone, email, service, message, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (name, phone, email, service, f"Subject: {subject}\n\n{message_text}", datetime.now().isoformat()))
-        
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            cursor = conn.cursor()
+            
+            # Use email as phone if email is provided, otherwise use 'Not provided'
+            phone = email if email else 'Not provided'
+            service = 'Portfolio Contact'
+            
+            cursor.execute('''
+                INSERT INTO inquiries (name, phone, email, service, message, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (name, phone, email, service, f"Subject: {subject}\n\n{message_text}", datetime.now().isoformat()))
+        inquiry_added(service)
         
         # Prepare redirect links
         if method == 'email':
@@ -651,6 +768,9 @@ def chat():
     
     start_time = datetime.now()
     
+    # Use one model/vocab/intents snapshot for the whole request
+    bundle = model_bundle
+    
     if not user_message:
         return jsonify({
             'response': 'Please enter a message.',
@@ -658,22 +778,27 @@ def chat():
             'suggestions': QUICK_REPLIES['default']
         })
     
-    # Get session ID for analytics
+    # Get session ID for analytics and the server-side conversation
     if 'session_id' not in session:
-        session['session_id'] = secrets.token_hex(8)
+        session['session_id'] = secrets.token_hex(16)
     session_id = session['session_id']
+    chat_state = conversation_store.load(session_id)
     
     # Spell check and auto-correct
-    corrected_message = spell_check_message(user_message)
+    corrected_message = spell_check_message(user_message, bundle.speller)
     
-    # Extract context from previous conversation
-    context = extract_context_from_session()
+    # Context from previous turns, kept up to date as turns are added
+    context = chat_state['context']
+    context_aware = context.is_active()
+    
+    # Image request, vehicle category, topics and script in one pass
+    analysis = message_analyzer.analyze(user_message)
     
     # Use preferred language if provided, otherwise auto-detect
     if preferred_language and preferred_language != 'en':
         user_lang = preferred_language
     else:
-        user_lang = detect_language(user_message)
+        user_lang = analysis.language
     
     # Translate to English if needed (for intent recognition)
     if user_lang != 'en':
@@ -681,37 +806,16 @@ def chat():
     else:
         message_for_processing = corrected_message
     
-    # Initialize session conversation history
-    if 'conversation' not in session:
-        session['conversation'] = []
-        session['failed_attempts'] = 0
-        session['last_intent'] = None
-    
     # Check if user is asking for images/photos/examples
-    user_message_lower = user_message.lower()
-    image_keywords = ['image', 'images', 'photo', 'photos', 'picture', 'pictures', 'show me', 'example', 'examples', 'see', 'look', 'view', 'gallery', 'portfolio']
-    is_asking_for_images = any(keyword in user_message_lower for keyword in image_keywords)
+    is_asking_for_images = analysis.wants_images
     
     # Detect vehicle category from current message or last intent
-    category_detected = None
-    category_map = {
-        'urbania': ['urbania'],
-        'caravan': ['caravan', 'mobile home', 'home on wheels'],
-        'traveller': ['traveller', 'tourist', 'tour'],
-        'icu': ['icu', 'ambulance', 'medical', 'hospital'],
-        'interior': ['interior', 'luxury', 'wood', 'fiber'],
-        'campaign': ['campaign', 'election', 'political']
-    }
-    
-    for category, keywords in category_map.items():
-        if any(keyword in user_message_lower for keyword in keywords):
-            category_detected = category
-            break
+    category_detected = analysis.category
     
     # If asking for images and category is detected or was recently discussed
     if is_asking_for_images:
         # Use detected category or fall back to last discussed intent
-        if not category_detected and session.get('last_intent'):
+        if not category_detected and context.last_intent:
             intent_to_category = {
                 'force_urbania': 'urbania',
                 'caravan': 'caravan',
@@ -719,7 +823,7 @@ def chat():
                 'special_purpose': 'icu',
                 'luxury_interior': 'interior'
             }
-            category_detected = intent_to_category.get(session.get('last_intent'))
+            category_detected = intent_to_category.get(context.last_intent)
         
         if category_detected and category_detected in GALLERY_IMAGES:
             images = random.sample(GALLERY_IMAGES[category_detected], min(3, len(GALLERY_IMAGES[category_detected])))
@@ -739,6 +843,9 @@ def chat():
             
             response += f"\nView more in our [Gallery](/gallery?category={category_detected})!"
             
+            # Not part of the history, but the session is still active
+            conversation_store.save(session_id, chat_state)
+            
             return jsonify({
                 'response': response,
                 'confidence': 100,
@@ -747,109 +854,85 @@ def chat():
                 'suggestions': ['View full gallery', 'Tell me more about ' + category_names.get(category_detected, category_detected), 'Contact for quote']
             })
     
-    # Add user message to history
-    session['conversation'].append({
+    # User message for the history; stored together with the reply below
+    user_turn = {
         'role': 'user',
         'message': user_message,
+        'topics': sorted(analysis.topics),
         'timestamp': datetime.now().isoformat()
-    })
+    }
+    context.add_user_turn(user_message, analysis.topics)
     
     # Tokenize and predict
     sentence = tokenize(message_for_processing)
-    X = bag_of_words(sentence, all_words)
-    X = X.reshape(1, X.shape[0])
-    X = torch.from_numpy(X).to(device)
-
-    output = model(X)
-    _, predicted = torch.max(output, dim=1)
-    tag = tags[predicted.item()]
-
-    probs = torch.softmax(output, dim=1)
-    confidence = probs[0][predicted.item()].item()
+    tag, confidence = predict_intent(bundle.classifier, sentence)
 
     # Determine response based on confidence level
-    if confidence > MEDIUM_CONFIDENCE:
-        session['failed_attempts'] = 0
-        session['last_intent'] = tag  # Store the intent for image requests
-        for intent in intents['intents']:
-            if tag == intent["tag"]:
-                response = random.choice(intent['responses'])
-                
-                # Check for holidays if asking about working hours
-                if tag == 'working_hours':
-                    today = datetime.now()
-                    today_str = today.strftime('%Y-%m-%d')
-                    holiday = check_if_holiday(today_str)
-                    
-                    if holiday:
-                        response = f"Today ({today.strftime('%B %d, %Y')}) is a holiday - {holiday['name']}. We are closed today. Our regular working hours are Monday to Saturday, 9 AM to 6 PM."
-                    elif today.weekday() == 6:  # Sunday
-                        response = "We're closed on Sundays. Our working hours are Monday to Saturday from 9 AM to 6 PM."
-                
-                # Format response for better readability
-                response = format_response(response, tag)
-                
-                # Translate response to user's language
-                if user_lang != 'en':
-                    response = translate_text(response, target_lang=user_lang, source_lang='en')
-                
-                # Add helpful context for certain intents
-                if tag in ['contact', 'location', 'working_hours']:
-                    tip_text = "\n\n💡 Tip: You can also click the chat bubble to ask more questions!"
-                    if user_lang != 'en':
-                        tip_text = translate_text(tip_text, target_lang=user_lang, source_lang='en')
-                    response += tip_text
-                
-                # Add image suggestion for vehicle-related intents
-                if tag in ['force_urbania', 'caravan', 'force_traveller', 'special_purpose', 'luxury_interior']:
-                    img_text = "\n\n📸 Want to see examples? Just ask 'show me images' or 'show photos'!"
-                    if user_lang != 'en':
-                        img_text = translate_text(img_text, target_lang=user_lang, source_lang='en')
-                    response += img_text
-                
-                # Get relevant suggestions
-                suggestions = QUICK_REPLIES.get(tag, QUICK_REPLIES['default'])
-                
-                # Add to conversation history
-                session['conversation'].append({
-                    'role': 'bot',
-                    'message': response,
-                    'confidence': confidence,
-                    'intent': tag,
-                    'timestamp': datetime.now().isoformat()
-                })
-                session.modified = True
-                
-                # Calculate response time
-                response_time = (datetime.now() - start_time).total_seconds()
-                
-                # Log conversation for analytics
-                log_conversation(session_id, user_message, response, tag, confidence, user_lang, response_time)
-                
-                # Learn from this question
-                learn_from_question(user_message, tag, confidence)
-                
-                # Only include WhatsApp link for contact-related intents
-                response_data = {
-                    'response': response,
-                    'confidence': round(confidence * 100, 1),
-                    'intent': tag,
-                    'suggestions': suggestions,
-                    'detected_language': user_lang,
-                    'context_aware': bool(context.get('last_intent')),
-                    'spell_corrected': corrected_message != user_message,
-                    'response_time_ms': round(response_time * 1000, 2)
-                }
-                
-                # Add WhatsApp link only for contact-related intents
-                if tag in ['contact', 'location', 'working_hours', 'goodbye'] or session['failed_attempts'] >= 2:
-                    response_data['whatsapp_link'] = 'https://wa.me/918148145706?text=' + quote(f"Hi, I'm interested in {tag.replace('_', ' ')}")
-                
-                return jsonify(response_data)
+    entry = bundle.catalog.get(tag)
+    if confidence > MEDIUM_CONFIDENCE and entry is not None:
+        chat_state['failed_attempts'] = 0
+        
+        # Check for holidays if asking about working hours
+        response = None
+        if tag == 'working_hours':
+            today = datetime.now()
+            today_str = today.strftime('%Y-%m-%d')
+            holiday = check_if_holiday(today_str)
+            
+            if holiday:
+                response = decorate_response(f"Today ({today.strftime('%B %d, %Y')}) is a holiday - {holiday['name']}. We are closed today. Our regular working hours are Monday to Saturday, 9 AM to 6 PM.", tag)
+            elif today.weekday() == 6:  # Sunday
+                response = decorate_response("We're closed on Sundays. Our working hours are Monday to Saturday from 9 AM to 6 PM.", tag)
+        
+        # Responses are formatted ahead of time in the catalog
+        if response is None:
+            response = random.choice(entry['responses'])
+        
+        # Translate response to user's language
+        if user_lang != 'en':
+            response = translate_text(response, target_lang=user_lang, source_lang='en')
+        
+        # Add to conversation history; the intent is remembered for image requests
+        context.add_bot_turn(response, tag)
+        conversation_store.save(session_id, chat_state, [user_turn, {
+            'role': 'bot',
+            'message': response,
+            'confidence': confidence,
+            'intent': tag,
+            'timestamp': datetime.now().isoformat()
+        }])
+        
+        # Calculate response time
+        response_time = (datetime.now() - start_time).total_seconds()
+        
+        # Log conversation for analytics
+        log_conversation(session_id, user_message, response, tag, confidence, user_lang, response_time)
+        
+        # Learn from this question
+        learn_from_question(user_message, tag, confidence)
+        
+        response_data = {
+            'response': response,
+            'confidence': round(confidence * 100, 1),
+            'intent': tag,
+            'suggestions': entry['suggestions'],
+            'detected_language': user_lang,
+            'context_aware': context_aware,
+            'context_topics': context.mentioned_topics(),
+            'spell_corrected': corrected_message != user_message,
+            'response_time_ms': round(response_time * 1000, 2)
+        }
+        
+        # Add WhatsApp link only for contact-related intents
+        if entry['whatsapp_link']:
+            response_data['whatsapp_link'] = entry['whatsapp_link']
+        
+        return jsonify(response_data)
     
     elif confidence > LOW_CONFIDENCE:
         # Medium confidence - ask for clarification
-        session['failed_attempts'] += 1
+        chat_state['failed_attempts'] += 1
+        conversation_store.save(session_id, chat_state, [user_turn])
         response = f"I think you're asking about {tag.replace('_', ' ')}. Could you please provide more details or rephrase your question?"
         
         # Translate clarification request
@@ -868,9 +951,9 @@ def chat():
     
     else:
         # Low confidence - provide help
-        session['failed_attempts'] = session.get('failed_attempts', 0) + 1
+        chat_state['failed_attempts'] += 1
         
-        if session['failed_attempts'] >= 3:
+        if chat_state['failed_attempts'] >= 3:
             response = """I'm having trouble understanding. Let me connect you with our team:
             
 📞 Phone: +91 81481 45706, +91 9847297290
@@ -878,12 +961,13 @@ def chat():
 ⏰ Hours: Mon-Sat, 9 AM - 6 PM
 
 Or try asking about:"""
-            session['failed_attempts'] = 0
+            chat_state['failed_attempts'] = 0
             # Show WhatsApp button when user is struggling
             whatsapp_available = True
         else:
             response = "I'm not quite sure about that. Could you rephrase or try one of these questions?"
             whatsapp_available = False
+        conversation_store.save(session_id, chat_state, [user_turn])
         
         # Translate help message
         if user_lang != 'en':
@@ -910,18 +994,117 @@ Or try asking about:"""
         
         return jsonify(response_data)
 
+def predict_batch(messages, top_k=3):
+    """Classify many messages with one feature matrix and one forward pass"""
+    bundle = model_bundle
+    results = bundle.classifier.predict_batch([spell_check_message(m, bundle.speller) for m in messages], top_k)
+    for message, result in zip(messages, results):
+        result['message'] = message
+    return results
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Classify a list of messages in a single batch (re-scoring, QA runs)"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.json or {}
+    messages = data.get('messages')
+    top_k = data.get('top_k', 3)
+    
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({'status': 'error', 'message': 'messages must be a list of strings'}), 400
+    
+    if len(messages) > CHAT_BATCH_LIMIT:
+        return jsonify({'status': 'error', 'message': f'At most {CHAT_BATCH_LIMIT} messages per batch'}), 400
+    
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or top_k < 1:
+        return jsonify({'status': 'error', 'message': 'top_k must be a positive integer'}), 400
+    
+    results = predict_batch(messages, top_k)
+    for result in results:
+        result['confidence'] = round(result['confidence'] * 100, 1)
+        for candidate in result['top_k']:
+            candidate['confidence'] = round(candidate['confidence'] * 100, 1)
+    
+    return jsonify({
+        'status': 'success',
+        'count': len(results),
+        'results': results
+    })
+
+@app.route('/admin/performance-stats')
+def performance_stats():
+    """Inference pipeline counters for monitoring"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    bundle = model_bundle
+    classifier = bundle.classifier
+    return jsonify({
+        'micro_batching': micro_batcher.stats() if micro_batcher is not None else None,
+        'prediction_cache': classifier.cache.stats() if classifier.cache is not None else None,
+        'stem_cache': stem_cache_stats(),
+        'spell_checker': bundle.speller.stats(),
+        'holiday_calendar': holiday_calendar.stats(),
+        'sessions': conversation_store.stats(),
+        'analytics_writer': analytics_writer.stats(),
+        'db_pool': db.stats(),
+        'query_cache': query_cache.stats()
+    })
+
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model_route():
+    """Reload the trained model in the background without a restart"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if model_reload_lock.locked():
+        return jsonify({'status': 'error', 'message': 'A reload is already in progress'}), 409
+    
+    threading.Thread(target=reload_model, name='model-reload', daemon=True).start()
+    return jsonify({'status': 'success', 'message': 'Model reload started'}), 202
+
+@app.route('/admin/model-status')
+def model_status():
+    """Currently served model and the outcome of the last reload"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    bundle = model_bundle
+    return jsonify({
+        'loaded_at': bundle.loaded_at,
+        'tags': len(bundle.classifier.tags),
+        'vocabulary_size': len(bundle.classifier.all_words),
+        'intents': len(bundle.intents['intents']),
+        'reload_state': model_reload_status['state'],
+        'last_reload': model_reload_status['last_reload'],
+        'last_error': model_reload_status['last_error']
+    })
+
 @app.route('/reset-session', methods=['POST'])
 def reset_session():
     """Clear conversation history"""
+    if 'session_id' in session:
+        conversation_store.delete(session['session_id'])
     session.clear()
     return jsonify({'status': 'success', 'message': 'Session reset'})
 
 @app.route('/conversation-history', methods=['GET'])
 def get_conversation_history():
-    """Get conversation history for analytics"""
+    """Get conversation history for analytics, newest page first (?before=<seq>&limit=)"""
+    if 'session_id' not in session:
+        return jsonify({'conversation': [], 'messageCount': 0, 'totalMessages': 0, 'nextBefore': None})
+    
+    before = request.args.get('before', type=int)
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), SESSION_MAX_TURNS)
+    session_id = session['session_id']
+    turns, next_before = conversation_store.history(session_id, before, limit)
     return jsonify({
-        'conversation': session.get('conversation', []),
-        'messageCount': len(session.get('conversation', []))
+        'conversation': turns,
+        'messageCount': len(turns),
+        'totalMessages': conversation_store.load(session_id)['turns'],
+        'nextBefore': next_before
     })
 
 @app.route('/submit-contact', methods=['POST'])
@@ -964,13 +1147,12 @@ def submit_contact():
             }), 400
         
         # Save to database
-        conn = get_db_connection()
-        conn.execute('''
-            INSERT INTO inquiries (name, phone, email, service, message)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, phone, email, service, message))
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            conn.execute('''
+                INSERT INTO inquiries (name, phone, email, service, message)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (name, phone, email, service, message))
+        inquiry_added(service)
         
         # Log to console
         inquiry_log = f"""
@@ -995,70 +1177,165 @@ def submit_contact():
             'message': 'Something went wrong. Please try again or call us directly.'
         }), 500
 
-@app.route('/admin/inquiries')
-def view_inquiries():
-    """Admin page to view all inquiries with filtering and search"""
-    # Simple password check (not logged in via session)
-    if 'admin_logged_in' not in session:
-        return redirect(url_for('admin_login'))
-    
-    conn = get_db_connection()
-    
-    # Get filter parameters
-    search = request.args.get('search', '')
-    status_filter = request.args.get('status', 'all')
-    service_filter = request.args.get('service', 'all')
-    priority_filter = request.args.get('priority', 'all')
-    date_filter = request.args.get('date', 'all')
+
+# Admin lists show ADMIN_PAGE_SIZE rows (?limit= up to ADMIN_MAX_PAGE_SIZE)
+# and load older ones on demand by a (timestamp, id) cursor, see pagination.py.
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+# Admin read queries (totals, chart counts, filter options) are cached for up
+# to QUERY_CACHE_TTL seconds. Routes that write inquiries call the hooks below
+# to patch or drop the cached results; the TTL covers other workers' writes.
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_TTL = 60
+query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+def cached_counts(key, conn, query, params=()):
+    """First row of an aggregate query as a dict, through the query cache"""
+    return query_cache.get(key, lambda: dict(conn.execute(query, params).fetchone()))
+
+def count_new_inquiry(key, counts, service):
+    # A new inquiry is new, medium priority and timestamped now
+    filters = dict(key[1:])
+    if filters['search']:
+        return None  # can't tell whether it matches; recount
+    if (filters['status'] not in ('all', 'new') or filters['priority'] not in ('all', 'medium') or
+            filters['service'] not in ('all', service)):
+        return counts
+    return dict(counts, total=counts['total'] + 1, new=counts['new'] + 1, week=counts['week'] + 1)
+
+def add_service_count(counts, service):
+    totals = dict(counts)
+    totals[service] = totals.get(service, 0) + 1
+    return tuple(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+def inquiry_added(service):
+    """Bring cached admin queries up to date with one new inquiry"""
+    if service == 'Portfolio Contact':
+        return  # excluded from every cached admin query
+    query_cache.update('inquiry_counts', lambda key, counts: count_new_inquiry(key, counts, service))
+    query_cache.update('service_counts', lambda key, counts: add_service_count(counts, service))
+    query_cache.update('services', lambda key, services: services if service in services else services + (service,))
+
+def inquiries_changed(deleted=False):
+    """Drop cached admin queries after inquiries were edited or deleted"""
+    query_cache.invalidate('inquiry_counts')
+    if deleted:
+        query_cache.invalidate('service_counts', 'services')
+
+def inquiry_filters():
+    """Filter parameters of the admin inquiries page"""
+    return {
+        'search': request.args.get('search', ''),
+        'status': request.args.get('status', 'all'),
+        'service': request.args.get('service', 'all'),
+        'priority': request.args.get('priority', 'all'),
+        'date': request.args.get('date', 'all')
+    }
+
+def build_inquiry_query(filters):
+    """Unordered SELECT for the filters -> (query, params, matched by a search)"""
+    search = filters['search']
     
     # Build query (exclude Portfolio Contact from main inquiries)
-    query = 'SELECT * FROM inquiries WHERE service != "Portfolio Contact"'
-    params = []
-    
-    if search:
-        query += ' AND (name LIKE ? OR phone LIKE ? OR email LIKE ? OR message LIKE ?)'
-        search_param = f'%{search}%'
-        params.extend([search_param, search_param, search_param, search_param])
+    match_sql, params = inquiry_search(search) if search else (None, [])
+    if match_sql:
+        query = f"SELECT inquiries.* FROM inquiries JOIN ({match_sql}) AS matches ON matches.id = inquiries.id WHERE service != 'Portfolio Contact'"
+    else:
+        query = "SELECT * FROM inquiries WHERE service != 'Portfolio Contact'"
+        if search:
+            query += ' AND 0'  # nothing searchable in it
     
-    if status_filter != 'all':
+    if filters['status'] != 'all':
         query += ' AND status = ?'
-        params.append(status_filter)
+        params.append(filters['status'])
     
-    if service_filter != 'all':
+    if filters['service'] != 'all':
         query += ' AND service = ?'
-        params.append(service_filter)
+        params.append(filters['service'])
     
-    if priority_filter != 'all':
+    if filters['priority'] != 'all':
         query += ' AND priority = ?'
-        params.append(priority_filter)
+        params.append(filters['priority'])
     
+    date_filter = filters['date']
     if date_filter != 'all':
+        # Compare timestamp itself (not DATE(timestamp)) so the indexes apply
         if date_filter == 'today':
-            query += ' AND DATE(timestamp) = DATE("now")'
+            query += " AND timestamp >= DATE('now') AND timestamp < DATE('now', '+1 day')"
         elif date_filter == 'week':
-            query += ' AND DATE(timestamp) >= DATE("now", "-7 days")'
+            query += " AND timestamp >= DATE('now', '-7 days')"
         elif date_filter == 'month':
-            query += ' AND DATE(timestamp) >= DATE("now", "-30 days")'
-    
-    query += ' ORDER BY timestamp DESC'
-    
-    inquiries = conn.execute(query, params).fetchall()
+            query += " AND timestamp >= DATE('now', '-30 days')"
+    
+    return query, params, match_sql is not None
+
+def fetch_inquiries(conn, filters, cursor=None, limit=ADMIN_PAGE_SIZE):
+    """One page of filtered inquiries, newest first, and the cursor for the next
+
+    Searches are ranked by relevance instead (see search.py) and paged by
+    offset, since rank has no keyset to resume from.
+    """
+    query, params, ranked = build_inquiry_query(filters)
+    if ranked:
+        # Exact phone/email hits first, then by bm25 relevance
+        query += ' ORDER BY matches.exact DESC, matches.rank, timestamp DESC, inquiries.id DESC'
+        return offset_page(conn, query, params, parse_offset(cursor), limit)
+    return keyset_page(conn, query, params, parse_cursor(cursor), limit)
+
+def inquiry_counts(conn, filters):
+    """Totals for the stat cards over everything the filters match (cached)"""
+    query, params, ranked = build_inquiry_query(filters)
+    return cached_counts(('inquiry_counts',) + tuple(sorted(filters.items())), conn, f'''
+        SELECT COUNT(*) AS total,
+               COALESCE(SUM(status = 'new'), 0) AS new,
+               COALESCE(SUM(priority = 'high'), 0) AS high,
+               COALESCE(SUM(timestamp >= DATE('now', '-7 days')), 0) AS week
+        FROM ({query})
+    ''', params)
+
+@app.route('/admin/inquiries')
+def view_inquiries():
+    """Admin page to view all inquiries with filtering and search"""
+    # Simple password check (not logged in via session)
+    if 'admin_logged_in' not in session:
+        return redirect(url_for('admin_login'))
     
-    # Get all unique services for filter dropdown (exclude Portfolio Contact)
-    services = conn.execute('SELECT DISTINCT service FROM inquiries WHERE service != "Portfolio Contact"').fetchall()
+    filters = inquiry_filters()
+    limit = page_limit(request.args.get('limit', type=int), ADMIN_PAGE_SIZE, ADMIN_MAX_PAGE_SIZE)
     
-    conn.close()
+    with db.connection() as conn:
+        inquiries, next_before = fetch_inquiries(conn, filters, request.args.get('before'), limit)
+        counts = inquiry_counts(conn, filters)
+        
+        # Get all unique services for filter dropdown (exclude Portfolio Contact)
+        services = query_cache.get(('services',), lambda: tuple(row['service'] for row in conn.execute(
+            "SELECT DISTINCT service FROM inquiries WHERE service != 'Portfolio Contact'")))
     
     return render_template('admin_inquiries.html', 
                          inquiries=inquiries, 
+                         counts=counts,
+                         next_before=next_before,
+                         limit=limit,
                          services=services,
-                         filters={
-                             'search': search,
-                             'status': status_filter,
-                             'service': service_filter,
-                             'priority': priority_filter,
-                             'date': date_filter
-                         })
+                         filters=filters)
+
+@app.route('/admin/inquiries/rows')
+def inquiry_rows():
+    """Next page of inquiry table rows for 'Load more' (?before=<cursor>&limit= plus the page filters)"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = page_limit(request.args.get('limit', type=int), ADMIN_PAGE_SIZE, ADMIN_MAX_PAGE_SIZE)
+    with db.connection() as conn:
+        inquiries, next_before = fetch_inquiries(conn, inquiry_filters(), request.args.get('before'), limit)
+    
+    return jsonify({
+        'status': 'success',
+        'html': render_template('admin_inquiry_rows.html', inquiries=inquiries),
+        'count': len(inquiries),
+        'nextBefore': next_before
+    })
 
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
@@ -1067,10 +1344,9 @@ def admin_login():
         username = request.form.get('username')
         password = request.form.get('password')
         
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM admin_users WHERE username = ? AND password = ?', 
-                           (username, password)).fetchone()
-        conn.close()
+        with db.connection() as conn:
+            user = conn.execute('SELECT * FROM admin_users WHERE username = ? AND password = ?', 
+                               (username, password)).fetchone()
         
         if user:
             session['admin_logged_in'] = True
@@ -1091,10 +1367,9 @@ def admin_logout():
 @app.route('/admin/mark-read/<int:inquiry_id>', methods=['POST'])
 def mark_inquiry_read(inquiry_id):
     """Mark inquiry as read"""
-    conn = get_db_connection()
-    conn.execute('UPDATE inquiries SET status = ? WHERE id = ?', ('read', inquiry_id))
-    conn.commit()
-    conn.close()
+    with db.connection() as conn:
+        conn.execute('UPDATE inquiries SET status = ? WHERE id = ?', ('read', inquiry_id))
+    inquiries_changed()
     return jsonify({'status': 'success'})
 
 @app.route('/admin/update-priority/<int:inquiry_id>', methods=['POST'])
@@ -1103,10 +1378,9 @@ def update_priority(inquiry_id):
     data = request.json
     priority = data.get('priority', 'medium')
     
-    conn = get_db_connection()
-    conn.execute('UPDATE inquiries SET priority = ? WHERE id = ?', (priority, inquiry_id))
-    conn.commit()
-    conn.close()
+    with db.connection() as conn:
+        conn.execute('UPDATE inquiries SET priority = ? WHERE id = ?', (priority, inquiry_id))
+    inquiries_changed()
     return jsonify({'status': 'success'})
 
 @app.route('/admin/add-note/<int:inquiry_id>', methods=['POST'])
@@ -1115,24 +1389,21 @@ def add_note(inquiry_id):
     data = request.json
     note = data.get('note', '')
     
-    conn = get_db_connection()
-    # Append to existing notes
-    inquiry = conn.execute('SELECT notes FROM inquiries WHERE id = ?', (inquiry_id,)).fetchone()
-    existing_notes = inquiry['notes'] if inquiry['notes'] else ''
-    new_notes = f"{existing_notes}\n[{datetime.now().strftime('%Y-%m-%d %H:%M')}] {note}" if existing_notes else f"[{datetime.now().strftime('%Y-%m-%d %H:%M')}] {note}"
-    
-    conn.execute('UPDATE inquiries SET notes = ? WHERE id = ?', (new_notes, inquiry_id))
-    conn.commit()
-    conn.close()
+    with db.connection() as conn:
+        # Append to existing notes
+        inquiry = conn.execute('SELECT notes FROM inquiries WHERE id = ?', (inquiry_id,)).fetchone()
+        existing_notes = inquiry['notes'] if inquiry['notes'] else ''
+        new_notes = f"{existing_notes}\n[{datetime.now().strftime('%Y-%m-%d %H:%M')}] {note}" if existing_notes else f"[{datetime.now().strftime('%Y-%m-%d %H:%M')}] {note}"
+        
+        conn.execute('UPDATE inquiries SET notes = ? WHERE id = ?', (new_notes, inquiry_id))
     return jsonify({'status': 'success', 'notes': new_notes})
 
 @app.route('/admin/delete/<int:inquiry_id>', methods=['POST'])
 def delete_inquiry(inquiry_id):
     """Delete inquiry"""
-    conn = get_db_connection()
-    conn.execute('DELETE FROM inquiries WHERE id = ?', (inquiry_id,))
-    conn.commit()
-    conn.close()
+    with db.connection() as conn:
+        conn.execute('DELETE FROM inquiries WHERE id = ?', (inquiry_id,))
+    inquiries_changed(deleted=True)
     return jsonify({'status': 'success'})
 
 @app.route('/admin/bulk-delete', methods=['POST'])
@@ -1142,51 +1413,87 @@ def bulk_delete():
     ids = data.get('ids', [])
     
     if ids:
-        conn = get_db_connection()
-        placeholders = ','.join('?' * len(ids))
-        conn.execute(f'DELETE FROM inquiries WHERE id IN ({placeholders})', ids)
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            placeholders = ','.join('?' * len(ids))
+            conn.execute(f'DELETE FROM inquiries WHERE id IN ({placeholders})', ids)
+        inquiries_changed(deleted=True)
     
     return jsonify({'status': 'success', 'deleted': len(ids)})
 
+# Exports stream EXPORT_CHUNK_ROWS rows at a time (see export.py) and accept
+# ?format=csv|jsonl, ?gzip=1, ?start=/?end= (YYYY-MM-DD, inclusive) and
+# ?columns=<comma-separated keys>
+EXPORT_CHUNK_ROWS = 1000
+
+INQUIRY_EXPORT_COLUMNS = [
+    ('id', 'ID', None),
+    ('name', 'Name', None),
+    ('phone', 'Phone', None),
+    ('email', 'Email', None),
+    ('service', 'Service', None),
+    ('message', 'Message', None),
+    ('status', 'Status', None),
+    ('priority', 'Priority', None),
+    ('tags', 'Tags', None),
+    ('timestamp', 'Timestamp', None)
+]
+
+ANALYTICS_EXPORT_COLUMNS = [
+    ('id', 'ID', None),
+    ('session_id', 'Session ID', None),
+    ('user_message', 'User Message', None),
+    ('bot_response', 'Bot Response', None),
+    ('intent', 'Intent', None),
+    ('confidence', 'Confidence', lambda value: round(value * 100, 1) if value else 0),
+    ('user_rating', 'Rating', lambda value: value if value else 'N/A'),
+    ('detected_language', 'Language', None),
+    ('response_time', 'Response Time (ms)', lambda value: round(value * 1000, 2) if value else 0),
+    ('timestamp', 'Timestamp', None)
+]
+
+def export_response(table, columns, name):
+    """Streaming download of `table` for the export query parameters"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'status': 'error', 'message': f'Unknown format: {export_format}'}), 400
+    
+    try:
+        columns = select_columns(columns, request.args.get('columns', ''))
+    except KeyError as e:
+        return jsonify({'status': 'error', 'message': f'Unknown column: {e.args[0]}'}), 400
+    
+    query = f"SELECT {', '.join(sorted({key for key, _, _ in columns} | {'id', 'timestamp'}))} FROM {table} WHERE 1"
+    params = []
+    try:
+        start = request.args.get('start')
+        if start:
+            query += ' AND timestamp >= ?'
+            params.append(datetime.strptime(start, '%Y-%m-%d').strftime('%Y-%m-%d'))
+        end = request.args.get('end')
+        if end:
+            query += ' AND timestamp < ?'
+            params.append((datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Dates must be YYYY-MM-DD'}), 400
+    
+    compress = request.args.get('gzip') in ('1', 'true')
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = f'{name}_{datetime.now().strftime("%Y%m%d")}.{extension}'
+    if compress:
+        mimetype, filename = 'application/gzip', filename + '.gz'
+    
+    rows = export_rows(db.connection, query, params, EXPORT_CHUNK_ROWS)
+    return Response(encode_export(rows, columns, export_format, compress),
+                    mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 @app.route('/admin/export-csv')
 def export_csv():
-    """Export inquiries as CSV"""
-    conn = get_db_connection()
-    inquiries = conn.execute('SELECT * FROM inquiries ORDER BY timestamp DESC').fetchall()
-    conn.close()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Name', 'Phone', 'Email', 'Service', 'Message', 'Status', 'Priority', 'Tags', 'Timestamp'])
-    
-    # Write data
-    for inquiry in inquiries:
-        writer.writerow([
-            inquiry['id'],
-            inquiry['name'],
-            inquiry['phone'],
-            inquiry['email'],
-            inquiry['service'],
-            inquiry['message'],
-            inquiry['status'],
-            inquiry['priority'],
-            inquiry['tags'],
-            inquiry['timestamp']
-        ])
-    
-    # Prepare response
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'inquiries_{datetime.now().strftime("%Y%m%d")}.csv'
-    )
+    """Export inquiries as CSV (or JSON Lines), streamed"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return export_response('inquiries', INQUIRY_EXPORT_COLUMNS, 'inquiries')
 
 @app.route('/admin/update-status/<int:inquiry_id>', methods=['POST'])
 def update_status(inquiry_id):
@@ -1194,10 +1501,9 @@ def update_status(inquiry_id):
     data = request.json
     status = data.get('status', 'new')
     
-    conn = get_db_connection()
-    conn.execute('UPDATE inquiries SET status = ? WHERE id = ?', (status, inquiry_id))
-    conn.commit()
-    conn.close()
+    with db.connection() as conn:
+        conn.execute('UPDATE inquiries SET status = ? WHERE id = ?', (status, inquiry_id))
+    inquiries_changed()
     return jsonify({'status': 'success'})
 
 @app.route('/admin/add-tag/<int:inquiry_id>', methods=['POST'])
@@ -1206,18 +1512,16 @@ def add_tag(inquiry_id):
     data = request.json
     tag = data.get('tag', '')
     
-    conn = get_db_connection()
-    inquiry = conn.execute('SELECT tags FROM inquiries WHERE id = ?', (inquiry_id,)).fetchone()
-    existing_tags = inquiry['tags'] if inquiry['tags'] else ''
-    tags_list = [t.strip() for t in existing_tags.split(',') if t.strip()]
-    
-    if tag and tag not in tags_list:
-        tags_list.append(tag)
-    
-    new_tags = ', '.join(tags_list)
-    conn.execute('UPDATE inquiries SET tags = ? WHERE id = ?', (new_tags, inquiry_id))
-    conn.commit()
-    conn.close()
+    with db.connection() as conn:
+        inquiry = conn.execute('SELECT tags FROM inquiries WHERE id = ?', (inquiry_id,)).fetchone()
+        existing_tags = inquiry['tags'] if inquiry['tags'] else ''
+        tags_list = [t.strip() for t in existing_tags.split(',') if t.strip()]
+        
+        if tag and tag not in tags_list:
+            tags_list.append(tag)
+        
+        new_tags = ', '.join(tags_list)
+        conn.execute('UPDATE inquiries SET tags = ? WHERE id = ?', (new_tags, inquiry_id))
     return jsonify({'status': 'success', 'tags': new_tags})
 
 @app.route('/admin/analytics-data')
@@ -1228,33 +1532,35 @@ def get_analytics_data():
     
     period = request.args.get('period', 'weekly')  # weekly, monthly, yearly
     
-    conn = get_db_connection()
-    
     # Determine date range based on period
     if period == 'weekly':
-        date_condition = 'DATE(timestamp) >= DATE("now", "-7 days")'
+        date_condition = "timestamp >= DATE('now', '-7 days')"
     elif period == 'monthly':
-        date_condition = 'DATE(timestamp) >= DATE("now", "-30 days")'
+        date_condition = "timestamp >= DATE('now', '-30 days')"
     elif period == 'yearly':
-        date_condition = 'DATE(timestamp) >= DATE("now", "-365 days")'
+        date_condition = "timestamp >= DATE('now', '-365 days')"
     else:
+        period = 'all'
         date_condition = '1=1'  # All time
     
-    # Get service-wise inquiry count (exclude Portfolio Contact)
-    query = f'''
-        SELECT service, COUNT(*) as count 
-        FROM inquiries 
-        WHERE {date_condition} AND service != 'Portfolio Contact'
-        GROUP BY service
-        ORDER BY count DESC
-    '''
-    
-    results = conn.execute(query).fetchall()
-    conn.close()
+    def count_services():
+        # Get service-wise inquiry count (exclude Portfolio Contact)
+        query = f'''
+            SELECT service, COUNT(*) as count 
+            FROM inquiries 
+            WHERE {date_condition} AND service != 'Portfolio Contact'
+            GROUP BY service
+            ORDER BY count DESC
+        '''
+        with db.connection() as conn:
+            return tuple((row['service'], row['count']) for row in conn.execute(query))
+    
+    # Cached; new inquiries are added to the cached counts (see inquiry_added)
+    results = query_cache.get(('service_counts', period), count_services)
     
     # Format data for chart
-    services = [row['service'] for row in results]
-    counts = [row['count'] for row in results]
+    services = [service for service, _ in results]
+    counts = [count for _, count in results]
     
     return jsonify({
         'labels': services,
@@ -1267,28 +1573,21 @@ def view_training_data():
     if 'admin_logged_in' not in session:
         return redirect(url_for('admin_login'))
     
-    # Load intents from file
-    with open('kalapuraparambil_intents.json', 'r', encoding='utf-8') as f:
-        intents_data = json.load(f)
+    # Intents as currently loaded (edits below swap them in right away)
+    bundle = model_bundle
+    intents = bundle.intents['intents']
     
     # Get search query if any
     search_query = request.args.get('search', '').lower()
     
-    # Filter intents based on search
+    # Search tag, patterns and responses through the bundle's FTS index, best match first
     if search_query:
-        filtered_intents = []
-        for intent in intents_data['intents']:
-            # Search in tag, patterns, or responses
-            if (search_query in intent['tag'].lower() or
-                any(search_query in pattern.lower() for pattern in intent['patterns']) or
-                any(search_query in response.lower() for response in intent['responses'])):
-                filtered_intents.append(intent)
-        intents_data['intents'] = filtered_intents
+        intents = [intents[i] for i in bundle.search.search(search_query)]
     
     return render_template('admin_training.html', 
-                         intents=intents_data['intents'],
+                         intents=intents,
                          search_query=search_query,
-                         total_intents=len(intents_data['intents']))
+                         total_intents=len(intents))
 
 @app.route('/admin/training-data/get/<tag>')
 def get_intent_data(tag):
@@ -1344,13 +1643,9 @@ def update_intent():
             json.dump(intents_data, f, indent=2, ensure_ascii=False)
         
         # Reload intents in memory
-        global intents
-        intents = intents_data
+        update_bundle_intents(intents_data)
         
-        return jsonify({
-            'status': 'success', 
-            'message': 'Intent updated successfully. Please retrain the model for changes to take effect.'
-        })
+        return edit_response('Intent updated successfully.', schedule_retrain(f'update {tag}'))
     
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1393,13 +1688,9 @@ def add_intent():
             json.dump(intents_data, f, indent=2, ensure_ascii=False)
         
         # Reload intents in memory
-        global intents
-        intents = intents_data
+        update_bundle_intents(intents_data)
         
-        return jsonify({
-            'status': 'success', 
-            'message': 'Intent added successfully. Please retrain the model for changes to take effect.'
-        })
+        return edit_response('Intent added successfully.', schedule_retrain(f'add {tag}'))
     
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -1427,17 +1718,30 @@ def delete_intent(tag):
             json.dump(intents_data, f, indent=2, ensure_ascii=False)
         
         # Reload intents in memory
-        global intents
-        intents = intents_data
+        update_bundle_intents(intents_data)
         
-        return jsonify({
-            'status': 'success', 
-            'message': 'Intent deleted successfully. Please retrain the model for changes to take effect.'
-        })
+        return edit_response('Intent deleted successfully.', schedule_retrain(f'delete {tag}'))
     
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/admin/training-data/retrain', methods=['POST'])
+def retrain_model():
+    """Queue a background retrain of the model from the current intents"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    job = retrain_queue.request('manual')
+    return jsonify({'status': 'success', 'message': 'Retraining queued', 'job': job}), 202
+
+@app.route('/admin/training-data/retrain/status')
+def retrain_status():
+    """Running and queued retrain jobs (epoch, loss) and the outcome of recent ones"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify(dict(retrain_queue.status(), status='success'))
+
 # Holiday Management Routes
 @app.route('/admin/holidays')
 def view_holidays():
@@ -1445,22 +1749,20 @@ def view_holidays():
     if 'admin_logged_in' not in session:
         return redirect(url_for('admin_login'))
     
-    conn = get_db_connection()
-    
-    # Get year filter
-    year = request.args.get('year', datetime.now().year)
-    
-    # Get all holidays for the year
-    holidays = conn.execute(
-        'SELECT * FROM holidays WHERE strftime("%Y", date) = ? ORDER BY date',
-        (str(year),)
-    ).fetchall()
-    
-    conn.close()
+    with db.connection() as conn:
+        
+        # Get year filter
+        year = request.args.get('year', default=datetime.now().year, type=int)
+        
+        # Get all holidays for the year (a range on date uses its unique index)
+        holidays = conn.execute(
+            'SELECT * FROM holidays WHERE date >= ? AND date < ? ORDER BY date',
+            (f'{year:04d}-01-01', f'{year + 1:04d}-01-01')
+        ).fetchall()
     
     return render_template('admin_holidays.html', 
                          holidays=holidays,
-                         current_year=int(year),
+                         current_year=year,
                          years=range(datetime.now().year - 1, datetime.now().year + 3))
 
 @app.route('/admin/holidays/add', methods=['POST'])
@@ -1478,19 +1780,16 @@ def add_holiday():
         if not date or not name:
             return jsonify({'status': 'error', 'message': 'Date and name are required'}), 400
         
-        conn = get_db_connection()
-        
         try:
-            conn.execute(
-                'INSERT INTO holidays (date, name, description) VALUES (?, ?, ?)',
-                (date, name, description)
-            )
-            conn.commit()
-            conn.close()
+            with db.connection() as conn:
+                conn.execute(
+                    'INSERT INTO holidays (date, name, description) VALUES (?, ?, ?)',
+                    (date, name, description)
+                )
+            holiday_calendar.reload()
             
             return jsonify({'status': 'success', 'message': 'Holiday added successfully'})
         except sqlite3.IntegrityError:
-            conn.close()
             return jsonify({'status': 'error', 'message': 'A holiday already exists for this date'}), 400
     
     except Exception as e:
@@ -1503,28 +1802,20 @@ def delete_holiday(holiday_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        conn = get_db_connection()
-        conn.execute('DELETE FROM holidays WHERE id = ?', (holiday_id,))
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            conn.execute('DELETE FROM holidays WHERE id = ?', (holiday_id,))
+        holiday_calendar.reload()
         
         return jsonify({'status': 'success', 'message': 'Holiday deleted successfully'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 def check_if_holiday(date_str=None):
-    """Check if a specific date is a holiday"""
+    """Check if a specific date is a holiday (in-memory calendar lookup)"""
     if date_str is None:
         date_str = datetime.now().strftime('%Y-%m-%d')
     
-    conn = get_db_connection()
-    holiday = conn.execute(
-        'SELECT * FROM holidays WHERE date = ?',
-        (date_str,)
-    ).fetchone()
-    conn.close()
-    
-    return holiday
+    return holiday_calendar.get(date_str)
 
 # New Analytics and Review Routes
 
@@ -1540,13 +1831,11 @@ def rate_conversation():
         if not conversation_id or not rating:
             return jsonify({'status': 'error', 'message': 'Missing required fields'}), 400
         
-        conn = get_db_connection()
-        conn.execute(
-            'UPDATE conversation_analytics SET user_rating = ? WHERE id = ?',
-            (rating, conversation_id)
-        )
-        conn.commit()
-        conn.close()
+        with db.connection() as conn:
+            conn.execute(
+                'UPDATE conversation_analytics SET user_rating = ? WHERE id = ?',
+                (rating, conversation_id)
+            )
         
         return jsonify({
             'status': 'success',
@@ -1561,64 +1850,31 @@ def analytics_dashboard():
     if 'admin_logged_in' not in session:
         return redirect(url_for('admin_login'))
     
-    conn = get_db_connection()
-    
-    # Get analytics data
-    total_conversations = conn.execute('SELECT COUNT(*) as count FROM conversation_analytics').fetchone()['count']
-    avg_confidence = conn.execute('SELECT AVG(confidence) as avg FROM conversation_analytics').fetchone()['avg']
-    avg_response_time = conn.execute('SELECT AVG(response_time) as avg FROM conversation_analytics').fetchone()['avg']
-    
-    # Top intents
-    top_intents = conn.execute('''
-        SELECT intent, COUNT(*) as count 
-        FROM conversation_analytics 
-        WHERE intent IS NOT NULL
-        GROUP BY intent 
-        ORDER BY count DESC 
-        LIMIT 10
-    ''').fetchall()
-    
-    # Language distribution
-    language_dist = conn.execute('''
-        SELECT detected_language, COUNT(*) as count 
-        FROM conversation_analytics 
-        GROUP BY detected_language
-    ''').fetchall()
-    
-    # Average ratings
-    avg_rating = conn.execute('''
-        SELECT AVG(user_rating) as avg 
-        FROM conversation_analytics 
-        WHERE user_rating IS NOT NULL
-    ''').fetchone()['avg']
-    
-    # Daily conversation trend (last 7 days)
-    daily_trend = conn.execute('''
-        SELECT DATE(timestamp) as date, COUNT(*) as count 
-        FROM conversation_analytics 
-        WHERE timestamp >= DATE('now', '-7 days')
-        GROUP BY DATE(timestamp)
-        ORDER BY date
-    ''').fetchall()
-    
-    # Most frequently asked questions
-    top_faqs = conn.execute('''
-        SELECT original_question, intent, frequency, last_asked 
-        FROM faq_patterns 
-        ORDER BY frequency DESC 
-        LIMIT 20
-    ''').fetchall()
-    
-    conn.close()
-    
+    with db.connection() as conn:
+        
+        # Conversation stats from the rollup tables (see analytics_rollups.py)
+        summary = dashboard_summary(conn)
+        
+        # Most frequently asked questions
+        top_faqs = conn.execute('''
+            SELECT original_question, intent, frequency, last_asked 
+            FROM faq_patterns 
+            ORDER BY frequency DESC 
+            LIMIT 20
+        ''').fetchall()
+    
+    avg_confidence = summary['avg_confidence']
+    avg_response_time = summary['avg_response_time']
+    avg_rating = summary['avg_rating']
     analytics_data = {
-        'total_conversations': total_conversations,
+        'total_conversations': summary['total_conversations'],
         'avg_confidence': round(avg_confidence * 100, 1) if avg_confidence else 0,
         'avg_response_time': round(avg_response_time * 1000, 2) if avg_response_time else 0,
         'avg_rating': round(avg_rating, 2) if avg_rating else 0,
-        'top_intents': [{'intent': r['intent'], 'count': r['count']} for r in top_intents],
-        'language_dist': [{'language': r['detected_language'], 'count': r['count']} for r in language_dist],
-        'daily_trend': [{'date': r['date'], 'count': r['count']} for r in daily_trend],
+        'top_intents': [{'intent': intent, 'count': count} for intent, count in summary['top_intents']],
+        'language_dist': [{'language': language, 'count': count} for language, count in summary['language_dist']],
+        'daily_trend': [{'date': date, 'count': count} for date, count in summary['daily_trend']],
+        'hourly_trend': [{'hour': hour[11:16], 'count': count} for hour, count in summary['hourly_trend']],
         'top_faqs': [{
             'question': r['original_question'],
             'intent': r['intent'],
@@ -1635,69 +1891,49 @@ def conversation_review():
     if 'admin_logged_in' not in session:
         return redirect(url_for('admin_login'))
     
-    page = request.args.get('page', 1, type=int)
-    per_page = 50
-    offset = (page - 1) * per_page
-    
-    conn = get_db_connection()
+    limit = page_limit(request.args.get('limit', type=int), ADMIN_PAGE_SIZE, ADMIN_MAX_PAGE_SIZE)
     
-    # Get total count
-    total = conn.execute('SELECT COUNT(*) as count FROM conversation_analytics').fetchone()['count']
-    
-    # Get conversations
-    conversations = conn.execute('''
-        SELECT * FROM conversation_analytics 
-        ORDER BY timestamp DESC 
-        LIMIT ? OFFSET ?
-    ''', (per_page, offset)).fetchall()
-    
-    conn.close()
+    with db.connection() as conn:
+        
+        # Total count, cached rather than counted on every view
+        total = cached_counts(('conversation_count',), conn,
+                              'SELECT COUNT(*) as count FROM conversation_analytics')['count']
+        
+        # Get conversations
+        conversations, next_before = keyset_page(conn, 'SELECT * FROM conversation_analytics WHERE 1', (),
+                                                 parse_cursor(request.args.get('before')), limit)
     
     return render_template('admin_conversation_review.html', 
                          conversations=conversations,
-                         page=page,
-                         total_pages=(total + per_page - 1) // per_page)
+                         total=total,
+                         next_before=next_before,
+                         limit=limit)
+
+@app.route('/admin/conversation-review/rows')
+def conversation_review_rows():
+    """Next page of conversations for 'Load more' (?before=<cursor>&limit=)"""
+    if 'admin_logged_in' not in session:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    limit = page_limit(request.args.get('limit', type=int), ADMIN_PAGE_SIZE, ADMIN_MAX_PAGE_SIZE)
+    with db.connection() as conn:
+        conversations, next_before = keyset_page(conn, 'SELECT * FROM conversation_analytics WHERE 1', (),
+                                                 parse_cursor(request.args.get('before')), limit)
+    
+    return jsonify({
+        'status': 'success',
+        'html': render_template('admin_conversation_rows.html', conversations=conversations),
+        'count': len(conversations),
+        'nextBefore': next_before
+    })
 
 @app.route('/admin/export-analytics', methods=['GET'])
 def export_analytics():
-    """Export analytics as CSV"""
+    """Export analytics as CSV (or JSON Lines), streamed"""
     if 'admin_logged_in' not in session:
         return jsonify({'error': 'Unauthorized'}), 401
     
-    conn = get_db_connection()
-    conversations = conn.execute('SELECT * FROM conversation_analytics ORDER BY timestamp DESC').fetchall()
-    conn.close()
-    
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow(['ID', 'Session ID', 'User Message', 'Bot Response', 'Intent', 'Confidence', 'Rating', 'Language', 'Response Time (ms)', 'Timestamp'])
-    
-    # Write data
-    for conv in conversations:
-        writer.writerow([
-            conv['id'],
-            conv['session_id'],
-            conv['user_message'],
-            conv['bot_response'],
-            conv['intent'],
-            round(conv['confidence'] * 100, 1) if conv['confidence'] else 0,
-            conv['user_rating'] if conv['user_rating'] else 'N/A',
-            conv['detected_language'],
-            round(conv['response_time'] * 1000, 2) if conv['response_time'] else 0,
-            conv['timestamp']
-        ])
-    
-    # Prepare response
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'conversation_analytics_{datetime.now().strftime("%Y%m%d")}.csv'
-    )
+    return export_response('conversation_analytics', ANALYTICS_EXPORT_COLUMNS, 'conversation_analytics')
 
 @app.route('/admin/faq-insights')
 def faq_insights():
@@ -1705,24 +1941,21 @@ def faq_insights():
     if 'admin_logged_in' not in session:
         return redirect(url_for('admin_login'))
     
-    conn = get_db_connection()
-    
-    # Get all FAQ patterns grouped by intent
-    faqs = conn.execute('''
-        SELECT intent, COUNT(*) as pattern_count, SUM(frequency) as total_asks
-        FROM faq_patterns
-        GROUP BY intent
-        ORDER BY total_asks DESC
-    ''').fetchall()
-    
-    # Get detailed patterns
-    detailed_patterns = conn.execute('''
-        SELECT * FROM faq_patterns
-        ORDER BY frequency DESC, last_asked DESC
-        LIMIT 100
-    ''').fetchall()
-    
-    conn.close()
+    with db.connection() as conn:
+        
+        # Per-intent totals from the trigger-maintained rollup
+        faqs = conn.execute('''
+            SELECT intent, pattern_count, total_asks
+            FROM faq_intent_summary
+            ORDER BY total_asks DESC
+        ''').fetchall()
+        
+        # Get detailed patterns
+        detailed_patterns = conn.execute('''
+            SELECT * FROM faq_patterns
+            ORDER BY frequency DESC, last_asked DESC
+            LIMIT 100
+        ''').fetchall()
     
     return render_template('admin_faq_insights.html',
                          faq_summary=faqs,
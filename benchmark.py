@@ -0,0 +1,754 @@
+"""Micro-benchmarks and equivalence checks for the chatbot hot paths
+
+Usage: python benchmark.py [section ...]
+
+Each section prints its timings and exits non-zero if its equivalence
+check fails. Run without arguments to run every section.
+"""
+import csv
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+import nltk_utils
+from message_analysis import (MessageAnalyzer, IMAGE_KEYWORDS, CATEGORY_KEYWORDS,
+                              TOPIC_KEYWORDS, SCRIPT_RANGES)
+from nltk_utils import BagOfWords, stem
+from spell import SpellCorrector, edit_distance, WORD_PATTERN
+from database import ConnectionPool
+from retrain import RetrainQueue, acquire_lock, run as retrain_run
+from schema import create_schema
+from search import inquiry_search, PHONE_KEY_SQL, EMAIL_KEY_SQL
+from pagination import keyset_page, parse_cursor
+from export import export_rows, encode_export
+from cache import QueryCache
+from analytics_rollups import dashboard_summary, rebuild, TIME_ROLLUPS, DIMENSION_ROLLUPS
+
+INTENTS_FILE = 'kalapuraparambil_intents.json'
+NUMPY_FILE = 'kalapuraparambil_data.npz'
+
+
+def load_intents():
+    with open(INTENTS_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_all_words():
+    with np.load(NUMPY_FILE, allow_pickle=False) as bundle:
+        return bundle['all_words'].tolist()
+
+
+def per_call_us(func, args_list, repeat=5):
+    """Best-of-`repeat` mean time per call in microseconds"""
+    def run():
+        for args in args_list:
+            func(*args)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best / len(args_list) * 1e6
+
+
+def cold_start_ms(mode):
+    """Time of the first tokenize() call in a fresh interpreter"""
+    code = (
+        "import time, nltk_utils\n"
+        f"nltk_utils.set_tokenizer_mode({mode!r})\n"
+        "start = time.perf_counter()\n"
+        "nltk_utils.tokenize('Hi, how much does a caravan cost?')\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def tokenizer():
+    """Regex vs nltk.word_tokenize: bag-of-words equivalence, per-call and cold-start time"""
+    intents = load_intents()
+    all_words = load_all_words()
+    featurizer = BagOfWords(all_words)
+    patterns = [p for intent in intents['intents'] for p in intent['patterns']]
+
+    # The vocabulary train.py would build must not change either
+    ignore_words = ['?', '.', '!']
+    vocabularies = {}
+    mismatches = []
+    for pattern in patterns:
+        nltk_tokens = nltk_utils.nltk_tokenize(pattern)
+        regex_tokens = nltk_utils.regex_tokenize(pattern)
+        if not np.array_equal(featurizer.transform(nltk_tokens), featurizer.transform(regex_tokens)):
+            mismatches.append((pattern, nltk_tokens, regex_tokens))
+        for mode, tokens in (('nltk', nltk_tokens), ('regex', regex_tokens)):
+            vocabularies.setdefault(mode, set()).update(stem(w) for w in tokens if w not in ignore_words)
+
+    print(f'{len(patterns)} patterns, {len(mismatches)} bag-of-words mismatches')
+    for pattern, nltk_tokens, regex_tokens in mismatches[:10]:
+        print(f'  {pattern!r}: nltk={nltk_tokens} regex={regex_tokens}')
+    same_vocabulary = vocabularies['nltk'] == vocabularies['regex']
+    print(f'training vocabulary identical: {same_vocabulary}')
+
+    args = [(p,) for p in patterns]
+    for mode in ('nltk', 'regex'):
+        func = nltk_utils.TOKENIZERS[mode]
+        print(f'{mode:>6}: {per_call_us(func, args):8.2f} us/call, cold start {cold_start_ms(mode):8.2f} ms')
+
+    return not mismatches and same_vocabulary
+
+
+def legacy_analysis(text):
+    """The separate scans /chat used to run before MessageAnalyzer"""
+    text_lower = text.lower()
+    wants_images = any(keyword in text_lower for keyword in IMAGE_KEYWORDS)
+    category = None
+    for name, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            category = name
+            break
+    topics = {topic for topic, keywords in TOPIC_KEYWORDS.items()
+              if any(keyword in text_lower for keyword in keywords)}
+    language = 'en'
+    for code, low, high in SCRIPT_RANGES:
+        if any(low <= c <= high for c in text):
+            language = code
+            break
+    return wants_images, category, topics, language
+
+
+def analysis():
+    """Single-pass MessageAnalyzer vs the per-feature scans it replaced"""
+    analyzer = MessageAnalyzer()
+    intents = load_intents()
+    samples = [p for intent in intents['intents'] for p in intent['patterns'] + intent['responses']]
+    samples += [
+        'Show me photos of your tourist caravans',
+        'urbania price? കാരവൻ വില എത്രയാണ്',
+        'கேரவன் விலை என்ன', 'ಕ್ಯಾರವಾನ್ ಬೆಲೆ ಎಷ್ಟು', 'कारवां की कीमत क्या है',
+        'Can I look at the luxury interior of an ambulance you built?',
+    ]
+
+    mismatches = [text for text in samples if tuple(analyzer.analyze(text)) != legacy_analysis(text)]
+    print(f'{len(samples)} messages, {len(mismatches)} mismatches')
+    for text in mismatches[:10]:
+        print(f'  {text!r}: {tuple(analyzer.analyze(text))} != {legacy_analysis(text)}')
+
+    messages = {
+        'short (~20 chars)': ['caravan price?', 'show me photos', 'hi there', 'urbania cost'],
+        'medium (~80 chars)': [s for s in samples if 60 <= len(s) <= 100][:50],
+        'long (~300 chars)': [s for s in samples if len(s) >= 250][:50],
+    }
+    for label, texts in messages.items():
+        args = [(t,) for t in texts]
+        legacy = per_call_us(legacy_analysis, args)
+        single = per_call_us(analyzer.analyze, args)
+        print(f'{label:>20}: legacy {legacy:7.2f} us, single pass {single:7.2f} us ({legacy / single:.1f}x)')
+
+    return not mismatches
+
+
+# Misspellings the old hand-written corrections dict covered
+LEGACY_MISSPELLINGS = {
+    'carvan': 'caravan', 'carvans': 'caravans', 'travler': 'traveller',
+    'modifikation': 'modification', 'modifcation': 'modification', 'custm': 'custom',
+    'luxry': 'luxury', 'prise': 'price', 'prising': 'pricing', 'ambulence': 'ambulance',
+    'vehical': 'vehicle', 'vehicel': 'vehicle', 'interier': 'interior', 'intrior': 'interior',
+    'servises': 'services', 'servis': 'service', 'contakt': 'contact', 'cntact': 'contact',
+    'wurkshop': 'workshop', 'qoute': 'quote', 'quation': 'quotation', 'timline': 'timeline',
+    'costm': 'custom'
+}
+
+
+# Correctly spelled words outside the pattern vocabulary; each used to be
+# pulled onto a vocabulary word (parking -> working, monday -> today, ...)
+VALID_WORDS = ['parking', 'monday', 'shop', 'told', 'insurance', 'slot', 'branch']
+
+
+def misspell(word, edits, rng):
+    """Apply `edits` random deletions, insertions, substitutions or swaps"""
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        kind = rng.choice(('delete', 'insert', 'substitute', 'swap'))
+        if kind == 'delete':
+            word = word[:i] + word[i + 1:]
+        elif kind == 'insert':
+            word = word[:i] + rng.choice(letters) + word[i:]
+        elif kind == 'substitute':
+            word = word[:i] + rng.choice(letters) + word[i + 1:]
+        elif i < len(word) - 1:
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def linear_lookup(speller, word):
+    """SpellCorrector.lookup by computing the distance to every vocabulary word"""
+    if word in speller.counts or word in speller.known_words or not WORD_PATTERN.fullmatch(word):
+        return word
+    limit = speller.allowed_distance(word)
+    if not limit:
+        return word
+    best, best_key = word, None
+    for candidate, count in speller.counts.items():
+        distance = edit_distance(word, candidate, limit)
+        if distance <= limit:
+            key = (distance, -count, candidate)
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+    return best
+
+
+def spelling():
+    """SymSpell index vs a linear vocabulary scan: agreement, accuracy, per-message cost"""
+    intents = load_intents()
+    speller = SpellCorrector.from_intents(intents, cache_size=0)
+    rng = random.Random(0)
+    words = sorted(w for w in speller.counts if len(w) >= 4)
+
+    # (misspelling, intended word); overrides are left out to measure the fuzzy match
+    cases = list(LEGACY_MISSPELLINGS.items())
+    for word in words:
+        cases.append((misspell(word, 1, rng), word))
+        if len(word) >= 6:
+            cases.append((misspell(word, 2, rng), word))
+    # A "misspelling" that is itself an English word is not a typo the speller should fix
+    cases = [(typo, word) for typo, word in cases
+             if typo != word and typo not in speller.counts and typo not in speller.known_words]
+
+    disagreements = [typo for typo, _ in cases if speller.lookup(typo) != linear_lookup(speller, typo)]
+    print(f'{len(speller.counts)} vocabulary words, {len(cases)} misspellings, '
+          f'{len(disagreements)} disagreements with the linear scan')
+    for typo in disagreements[:10]:
+        print(f'  {typo!r}: index={speller.lookup(typo)!r} linear={linear_lookup(speller, typo)!r}')
+
+    for label, subset in (('legacy dict', list(LEGACY_MISSPELLINGS.items())), ('all', cases)):
+        correct = sum(speller.lookup(typo) == word for typo, word in subset)
+        print(f'{label:>12} accuracy: {correct}/{len(subset)} ({correct / len(subset):.1%})')
+    unchanged = sum(speller.lookup(word) == word for word in speller.counts)
+    print(f'vocabulary words left unchanged: {unchanged}/{len(speller.counts)}')
+    changed = {word: speller.lookup(word) for word in VALID_WORDS if speller.lookup(word) != word}
+    message = 'book a slot for monday'
+    kept = speller.correct_message(message) == message
+    print(f'valid non-vocabulary words left unchanged: {len(VALID_WORDS) - len(changed)}/{len(VALID_WORDS)} '
+          f'{changed or ""}; {message!r} unchanged: {kept}')
+
+    # Per-message cost on pattern-like messages with one misspelled word
+    messages = []
+    for intent in intents['intents']:
+        for pattern in intent['patterns']:
+            tokens = pattern.lower().split()
+            i = rng.randrange(len(tokens))
+            if len(tokens[i]) >= 4:
+                tokens[i] = misspell(tokens[i], 1, rng)
+            messages.append(' '.join(tokens))
+    args = [(m,) for m in messages]
+    linear = per_call_us(lambda m: [linear_lookup(speller, w.strip('.,!?;:')) for w in m.split()], args, repeat=1)
+    index = per_call_us(lambda m: [speller.lookup(w.strip('.,!?;:')) for w in m.split()], args)
+    cached = SpellCorrector.from_intents(intents)
+    for message in messages:
+        cached.correct_message(message)
+    warm = per_call_us(cached.correct_message, args)
+    print(f'per message: linear scan {linear:9.2f} us, index {index:7.2f} us, warm cache {warm:6.2f} us')
+
+    return not disagreements and not changed and kept
+
+
+def legacy_connection(path):
+    """What get_db_connection did on every call before ConnectionPool"""
+    conn = sqlite3.connect(path, timeout=10.0)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    return conn
+
+
+def database():
+    """Per-request connect + PRAGMA vs a pooled connection, for a point lookup"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = legacy_connection(path)
+        conn.execute('CREATE TABLE holidays (id INTEGER PRIMARY KEY, date TEXT UNIQUE, name TEXT)')
+        conn.executemany('INSERT INTO holidays (date, name) VALUES (?, ?)',
+                         [(f'2026-{m:02d}-{d:02d}', 'holiday') for m in range(1, 13) for d in (1, 15)])
+        conn.commit()
+        conn.close()
+
+        def legacy(date):
+            conn = legacy_connection(path)
+            row = conn.execute('SELECT * FROM holidays WHERE date = ?', (date,)).fetchone()
+            conn.close()
+            return row
+
+        pool = ConnectionPool(path, size=1)
+
+        def pooled(date):
+            with pool.connection() as conn:
+                return conn.execute('SELECT * FROM holidays WHERE date = ?', (date,)).fetchone()
+
+        args = [(f'2026-{m:02d}-{d:02d}',) for m in range(1, 13) for d in range(1, 29)]
+        same = all(tuple(legacy(*a) or ()) == tuple(pooled(*a) or ()) for a in args)
+        print(f'{len(args)} lookups, identical results: {same}')
+        before = per_call_us(legacy, args)
+        after = per_call_us(pooled, args)
+        print(f'connect per request {before:8.2f} us, pooled {after:7.2f} us ({before / after:.1f}x)')
+        pool.close()
+        return same
+
+
+# Admin/analytics queries from app.py and the index (or indexes) each may use
+QUERY_PLANS = [
+    ('inquiries, newest first',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' ORDER BY timestamp DESC, id DESC LIMIT 51",
+     'idx_inquiries_timestamp'),
+    ('inquiries, next page',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' AND (timestamp, id) < ('2026-01-01 10:00:00', 500) "
+     "ORDER BY timestamp DESC, id DESC LIMIT 51",
+     'idx_inquiries_timestamp'),
+    ('inquiries by status',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' AND status = 'new' ORDER BY timestamp DESC",
+     'idx_inquiries_status_timestamp'),
+    ('inquiries by status, next page',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' AND status = 'new' "
+     "AND (timestamp, id) < ('2026-01-01 10:00:00', 500) ORDER BY timestamp DESC, id DESC LIMIT 51",
+     'idx_inquiries_status_timestamp'),
+    ('inquiries by priority',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' AND priority = 'high' ORDER BY timestamp DESC",
+     'idx_inquiries_priority_timestamp'),
+    ('inquiries by service',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' AND service = 'Caravan' ORDER BY timestamp DESC",
+     'idx_inquiries_service_timestamp'),
+    ('inquiries today',
+     "SELECT * FROM inquiries WHERE service != 'Portfolio Contact' AND timestamp >= DATE('now') "
+     "AND timestamp < DATE('now', '+1 day') ORDER BY timestamp DESC",
+     ('idx_inquiries_timestamp', 'idx_inquiries_timestamp_service')),
+    ('inquiries per service, last 30 days',
+     "SELECT service, COUNT(*) as count FROM inquiries WHERE timestamp >= DATE('now', '-30 days') "
+     "AND service != 'Portfolio Contact' GROUP BY service ORDER BY count DESC",
+     ('idx_inquiries_timestamp_service', 'idx_inquiries_service_timestamp')),
+    ('top intents',
+     'SELECT intent, COUNT(*) as count FROM conversation_analytics WHERE intent IS NOT NULL '
+     'GROUP BY intent ORDER BY count DESC LIMIT 10',
+     'idx_analytics_intent'),
+    ('language distribution',
+     'SELECT detected_language, COUNT(*) as count FROM conversation_analytics GROUP BY detected_language',
+     'idx_analytics_language'),
+    ('average rating',
+     'SELECT AVG(user_rating) as avg FROM conversation_analytics WHERE user_rating IS NOT NULL',
+     'idx_analytics_rating'),
+    ('daily trend',
+     "SELECT DATE(timestamp) as date, COUNT(*) as count FROM conversation_analytics "
+     "WHERE timestamp >= DATE('now', '-7 days') GROUP BY DATE(timestamp) ORDER BY date",
+     'idx_analytics_timestamp'),
+    ('conversation review, next page',
+     "SELECT * FROM conversation_analytics WHERE 1 AND (timestamp, id) < ('2026-01-01 10:00:00', 500) "
+     "ORDER BY timestamp DESC, id DESC LIMIT 51",
+     'idx_analytics_timestamp'),
+    ('top FAQs',
+     'SELECT original_question, intent, frequency, last_asked FROM faq_patterns ORDER BY frequency DESC LIMIT 20',
+     'idx_faq_patterns_frequency'),
+    ('holidays in a year',
+     "SELECT * FROM holidays WHERE date >= '2026-01-01' AND date < '2027-01-01' ORDER BY date",
+     'sqlite_autoindex_holidays_1'),
+    ('inquiry search by phone',
+     f"SELECT id FROM inquiries WHERE {PHONE_KEY_SQL} >= '98765' AND {PHONE_KEY_SQL} < '98766'",
+     'idx_inquiries_phone_key'),
+    ('inquiry search by email',
+     f"SELECT id FROM inquiries WHERE {EMAIL_KEY_SQL} >= 'anu@' AND {EMAIL_KEY_SQL} < 'anu@~'",
+     'idx_inquiries_email_key'),
+]
+
+
+def query_plans():
+    """EXPLAIN QUERY PLAN: each admin query must use its index, not a table scan"""
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'plans.db'), size=1)
+        ok = True
+        with pool.connection() as conn:
+            create_schema(conn)
+            for label, sql, indexes in QUERY_PLANS:
+                if isinstance(indexes, str):
+                    indexes = (indexes,)
+                plan = ' | '.join(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+                passed = any(f'INDEX {index}' in plan for index in indexes)
+                ok = ok and passed
+                print(f"{'ok  ' if passed else 'FAIL'} {label}: {plan}")
+        pool.close()
+    return ok
+
+
+def search():
+    """Four LIKE '%x%' scans vs the FTS5/phone/email search on 20k inquiries"""
+    rng = random.Random(0)
+    vocabulary = [''.join(rng.choice('abdeghiklmnoprstuvy') for _ in range(rng.randrange(4, 10)))
+                  for _ in range(3000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'search.db'), size=1)
+        with pool.connection() as conn:
+            create_schema(conn)
+            rows = [(f'Customer {i}', f'+91 {rng.randrange(10**9, 10**10)}', f'customer{i}@example.com', 'Caravan',
+                     ' '.join(rng.choice(vocabulary) for _ in range(rng.randrange(8, 60))))
+                    for i in range(20000)]
+            conn.executemany('INSERT INTO inquiries (name, phone, email, service, message) VALUES (?, ?, ?, ?, ?)', rows)
+
+            def legacy(text):
+                param = f'%{text}%'
+                return {row[0] for row in conn.execute(
+                    'SELECT id FROM inquiries WHERE name LIKE ? OR phone LIKE ? OR email LIKE ? OR message LIKE ?',
+                    (param,) * 4)}
+
+            def indexed(text):
+                sql, params = inquiry_search(text)
+                return {row[0] for row in conn.execute(sql, params)}
+
+            # Each word must find exactly the rows with a word starting with it;
+            # each name, email and phone number as typed must find its own row
+            words = rng.sample(vocabulary, 20)
+            same = all(indexed(word) == {i + 1 for i, row in enumerate(rows)
+                                         if any(w.startswith(word) for w in row[4].split())}
+                       for word in words)
+            picks = rng.sample(range(len(rows)), 15)
+            same = same and all(i + 1 in indexed(rows[i][field]) for i, field in zip(picks, [0, 1, 2] * 5))
+            args = [(word,) for word in words] + [(rows[i][field],) for i, field in zip(picks, [0, 1, 2] * 5)]
+            print(f'{len(args)} searches, expected matches found: {same}')
+            before = per_call_us(legacy, args, repeat=3)
+            after = per_call_us(indexed, args, repeat=3)
+            print(f'LIKE scan {before:10.1f} us, indexed {after:9.1f} us ({before / after:.1f}x)')
+        pool.close()
+    return same
+
+
+def pagination():
+    """LIMIT/OFFSET vs keyset pages over 100k conversations, shallow and deep"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'pages.db'), size=1)
+        with pool.connection() as conn:
+            create_schema(conn)
+            # Many rows share a timestamp, so the id tie-break matters
+            conn.executemany(
+                'INSERT INTO conversation_analytics (session_id, user_message, bot_response, timestamp) VALUES (?, ?, ?, ?)',
+                [('s', 'hi', 'hello', f'2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} 10:00:00')
+                 for _ in range(100000)]
+            )
+            conn.commit()
+            expected = [row['id'] for row in conn.execute(
+                'SELECT id FROM conversation_analytics ORDER BY timestamp DESC, id DESC')]
+
+            seen = []
+            before = None
+            while True:
+                rows, cursor = keyset_page(conn, 'SELECT * FROM conversation_analytics WHERE 1', (), before, 500)
+                seen.extend(row['id'] for row in rows)
+                if cursor is None:
+                    break
+                before = parse_cursor(cursor)
+            same = seen == expected
+            print(f'paged through {len(seen)} rows in order, identical: {same}')
+
+            for page in (1, 1000, 1999):
+                offset_us = per_call_us(lambda: conn.execute(
+                    'SELECT * FROM conversation_analytics ORDER BY timestamp DESC LIMIT 50 OFFSET ?',
+                    ((page - 1) * 50,)).fetchall(), [()])
+                cursor = None
+                if page > 1:
+                    last = conn.execute('SELECT timestamp, id FROM conversation_analytics ORDER BY timestamp DESC, id DESC '
+                                        'LIMIT 1 OFFSET ?', ((page - 1) * 50 - 1,)).fetchone()
+                    cursor = (last['timestamp'], last['id'])
+                keyset_us = per_call_us(lambda: keyset_page(
+                    conn, 'SELECT * FROM conversation_analytics WHERE 1', (), cursor, 50), [()])
+                print(f'page {page:5d}: OFFSET {offset_us:9.1f} us, keyset {keyset_us:7.1f} us')
+        pool.close()
+    return same
+
+
+EXPORT_COLUMNS = [('id', 'ID', None), ('session_id', 'Session ID', None), ('user_message', 'User Message', None),
+                  ('bot_response', 'Bot Response', None), ('intent', 'Intent', None),
+                  ('confidence', 'Confidence', lambda value: round(value * 100, 1) if value else 0),
+                  ('timestamp', 'Timestamp', None)]
+
+
+def legacy_export(pool):
+    with pool.connection() as conn:
+        rows = conn.execute('SELECT * FROM conversation_analytics ORDER BY timestamp DESC, id DESC').fetchall()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([header for _, header, _ in EXPORT_COLUMNS])
+    for row in rows:
+        writer.writerow([row[key] if formatter is None else formatter(row[key]) for key, _, formatter in EXPORT_COLUMNS])
+    return io.BytesIO(output.getvalue().encode('utf-8')).getvalue()
+
+
+def measure(func):
+    """(result, seconds, peak traced MB) of func()"""
+    tracemalloc.start()
+    start = timeit.default_timer()
+    result = func()
+    elapsed = timeit.default_timer() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def export():
+    """fetchall + StringIO + BytesIO vs the streaming export of 100k conversations"""
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'export.db'), size=2)
+        with pool.connection() as conn:
+            create_schema(conn)
+            conn.executemany(
+                'INSERT INTO conversation_analytics (session_id, user_message, bot_response, intent, confidence, timestamp) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [(f'session{i % 500}', 'what are your caravan prices for a wedding? ' * 2, 'Our caravans start at ... ' * 8,
+                  'cost_pricing', rng.random(), f'2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} 10:00:00')
+                 for i in range(100000)]
+            )
+
+        def streamed(export_format='csv', compress=False):
+            digest = hashlib.sha256()
+            size = 0
+            rows = export_rows(pool.connection, 'SELECT * FROM conversation_analytics WHERE 1', (), 1000)
+            for chunk in encode_export(rows, EXPORT_COLUMNS, export_format, compress):
+                digest.update(chunk)
+                size += len(chunk)
+            return digest.hexdigest(), size
+
+        legacy, legacy_s, legacy_mb = measure(lambda: legacy_export(pool))
+        (digest, size), stream_s, stream_mb = measure(streamed)
+        same = digest == hashlib.sha256(legacy).hexdigest()
+        print(f'{len(legacy) / 1e6:.1f} MB CSV, identical bytes: {same}')
+        print(f'in memory {legacy_s:6.2f} s, peak {legacy_mb:7.1f} MB')
+        print(f'streamed  {stream_s:6.2f} s, peak {stream_mb:7.1f} MB')
+
+        gzipped = b''.join(encode_export(export_rows(pool.connection, 'SELECT * FROM conversation_analytics WHERE 1'),
+                                         EXPORT_COLUMNS, compress=True))
+        same = same and gzip.decompress(gzipped) == legacy
+        print(f'gzip {len(gzipped) / 1e6:.1f} MB, decompresses to the same CSV: {same}')
+        lines = b''.join(encode_export(export_rows(pool.connection, 'SELECT * FROM conversation_analytics WHERE 1'),
+                                       EXPORT_COLUMNS, 'jsonl')).splitlines()
+        same = same and len(lines) == 100000 and json.loads(lines[0])['id'] == int(legacy.split(b'\r\n')[1].split(b',')[0])
+        print(f'jsonl {len(lines)} lines')
+        pool.close()
+    return same
+
+
+def legacy_dashboard(conn):
+    """The seven aggregate queries analytics_dashboard used to run over the raw log"""
+    totals = conn.execute('SELECT COUNT(*), AVG(confidence), AVG(response_time) FROM conversation_analytics').fetchone()
+    avg_rating = conn.execute('SELECT AVG(user_rating) FROM conversation_analytics WHERE user_rating IS NOT NULL').fetchone()[0]
+    intents = conn.execute('SELECT intent, COUNT(*) as count FROM conversation_analytics WHERE intent IS NOT NULL '
+                           'GROUP BY intent ORDER BY count DESC, intent LIMIT 10').fetchall()
+    languages = conn.execute('SELECT detected_language, COUNT(*) FROM conversation_analytics '
+                             'GROUP BY detected_language ORDER BY detected_language').fetchall()
+    daily = conn.execute("SELECT DATE(timestamp) as date, COUNT(*) FROM conversation_analytics "
+                         "WHERE timestamp >= DATE('now', '-7 days') GROUP BY DATE(timestamp) ORDER BY date").fetchall()
+    return {
+        'total_conversations': totals[0], 'avg_confidence': totals[1], 'avg_response_time': totals[2],
+        'avg_rating': avg_rating, 'top_intents': [tuple(row) for row in intents],
+        'language_dist': [tuple(row) for row in languages], 'daily_trend': [tuple(row) for row in daily]
+    }
+
+
+def comparable(summary):
+    # Float sums are added in a different order; ties in the top 10 sorted by name
+    summary = dict(summary)
+    for key in ('avg_confidence', 'avg_response_time', 'avg_rating'):
+        summary[key] = round(summary[key], 9) if summary[key] is not None else None
+    summary['top_intents'] = sorted(summary['top_intents'], key=lambda item: (-item[1], item[0]))
+    summary['language_dist'] = sorted(summary['language_dist'], key=lambda item: (item[0] is not None, item[0] or ''))
+    summary.pop('hourly_trend', None)
+    return summary
+
+
+def rollup_rows(conn):
+    tables = list(TIME_ROLLUPS) + [table for table, _, _ in DIMENSION_ROLLUPS]
+    return {table: [tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+                    for row in conn.execute(f'SELECT * FROM {table} WHERE conversations != 0 ORDER BY 1, 2')]
+            for table in tables}
+
+
+def rollups():
+    """Dashboard aggregates over 200k raw rows vs the trigger-maintained rollups"""
+    rng = random.Random(0)
+    intents = [f'intent_{i}' for i in range(60)]
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'rollups.db'), size=1)
+        with pool.connection() as conn:
+            create_schema(conn)
+            rows = [('s', 'hi', 'hello', rng.choice(intents + [None]), rng.choice([rng.random(), None]),
+                     rng.choice(['English', 'Malayalam', 'Hindi', None]), rng.random() / 10,
+                     rng.choice([None, None, rng.randrange(1, 6)]),
+                     (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=rng.randrange(60 * 24 * 90)))
+                     .strftime('%Y-%m-%d %H:%M:%S'))
+                    for _ in range(200000)]
+            start = timeit.default_timer()
+            conn.executemany(
+                'INSERT INTO conversation_analytics (session_id, user_message, bot_response, intent, confidence, '
+                'detected_language, response_time, user_rating, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.commit()
+            insert_us = (timeit.default_timer() - start) / len(rows) * 1e6
+            # Ratings and deletes go through the update/delete triggers
+            conn.executemany('UPDATE conversation_analytics SET user_rating = ? WHERE id = ?',
+                             [(rng.randrange(1, 6), rng.randrange(1, 200001)) for _ in range(5000)])
+            conn.execute('DELETE FROM conversation_analytics WHERE id % 97 = 0')
+            conn.commit()
+
+            same = comparable(dashboard_summary(conn)) == comparable(legacy_dashboard(conn))
+            incremental = rollup_rows(conn)
+            rebuild(conn)
+            conn.commit()
+            same = same and rollup_rows(conn) == incremental
+            print(f'dashboard from rollups matches raw aggregates, triggers match a rebuild: {same}')
+            before = per_call_us(legacy_dashboard, [(conn,)], repeat=3)
+            after = per_call_us(dashboard_summary, [(conn,)], repeat=3)
+            print(f'raw aggregates {before / 1000:8.2f} ms, rollups {after / 1000:6.2f} ms ({before / after:.0f}x); '
+                  f'insert with triggers {insert_us:.1f} us/row')
+        pool.close()
+    return same
+
+
+SERVICE_COUNTS = ("SELECT service, COUNT(*) as count FROM inquiries WHERE timestamp >= DATE('now', '-30 days') "
+                  "AND service != 'Portfolio Contact' GROUP BY service ORDER BY count DESC")
+
+
+def query_cache():
+    """Re-running the service GROUP BY vs the cache patched by each new inquiry"""
+    rng = random.Random(0)
+    services = ['Caravan', 'Force Urbania', 'Interiors', 'Tours', 'Ambulance', 'Portfolio Contact']
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'cache.db'), size=1)
+        cache = QueryCache(maxsize=16, ttl=None)
+        with pool.connection() as conn:
+            create_schema(conn)
+            conn.executemany(
+                "INSERT INTO inquiries (name, phone, service, message, timestamp) VALUES ('x', '1', ?, 'm', "
+                "DATETIME('now', ?))", [(rng.choice(services), f'-{rng.randrange(60 * 24 * 60)} minutes')
+                                        for _ in range(50000)])
+
+            def fresh():
+                return {row['service']: row['count'] for row in conn.execute(SERVICE_COUNTS)}
+
+            def cached():
+                return dict(cache.get(('service_counts', 'monthly'),
+                                      lambda: tuple((row['service'], row['count']) for row in conn.execute(SERVICE_COUNTS))))
+
+            def add(counts, service):
+                totals = dict(counts)
+                totals[service] = totals.get(service, 0) + 1
+                return tuple(totals.items())
+
+            cached()
+            # What the app does on /submit-contact: insert, then patch the cache
+            for _ in range(200):
+                service = rng.choice(services)
+                conn.execute("INSERT INTO inquiries (name, phone, service, message) VALUES ('x', '1', ?, 'm')", (service,))
+                if service != 'Portfolio Contact':
+                    cache.update('service_counts', lambda key, counts: add(counts, service))
+            same = cached() == fresh()
+            print(f'cached counts after 200 inserts match a fresh GROUP BY: {same}')
+            before = per_call_us(fresh, [()] * 20)
+            after = per_call_us(cached, [()] * 20)
+            print(f'GROUP BY {before:9.1f} us, cache hit {after:6.2f} us; {cache.stats()["hit_rate"]:.0%} hit rate')
+
+            # A write landing while a miss is computing must not be overwritten by the stale result
+            def stale_compute():
+                value = fresh()
+                conn.execute("INSERT INTO inquiries (name, phone, service, message) VALUES ('x', '1', 'Tours', 'm')")
+                cache.invalidate('service_counts')
+                return tuple(value.items())
+
+            cache.get(('service_counts', 'race'), stale_compute)
+            race_ok = cache.get(('service_counts', 'race'), lambda: tuple(fresh().items())) == tuple(fresh().items())
+            print(f'result computed across an invalidation is not cached: {race_ok}')
+        pool.close()
+    return same and race_ok
+
+
+# Stands in for retrain.py: a few epochs of progress, then a publish
+FAKE_RETRAIN = '''
+import json, time
+print(json.dumps({'event': 'started', 'max_epochs': 5}), flush=True)
+for epoch in range(1, 6):
+    time.sleep(0.05)
+    print(json.dumps({'event': 'epoch', 'epoch': epoch, 'loss': 1.0 / epoch}), flush=True)
+print('Stopping early at epoch 5')
+print(json.dumps({'event': 'published', 'loss': 0.2, 'accuracy': 0.9, 'baseline_accuracy': 0.9, 'message': 'ok'}))
+'''
+
+
+def retrain_queue():
+    """A burst of edits across two workers, then more mid-run: two child runs, no blocking"""
+    published = []
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(os.path.join(tmp, 'retrain.db'), size=4)
+        with pool.connection() as conn:
+            create_schema(conn)
+        # Two queues on one database stand in for two gunicorn workers
+        workers = [RetrainQueue([sys.executable, '-c', FAKE_RETRAIN], pool.connection,
+                                on_publish=lambda: published.append(1), delay=0.2, poll_interval=0.05,
+                                progress_interval=0)
+                   for _ in range(2)]
+        timings = []
+        for i in range(20):
+            timings.append(timeit.timeit(lambda: workers[i % 2].request(f'edit {i}'), number=1) * 1e6)
+        progress = []
+        while True:
+            status = workers[1].status()
+            if status['history'] and not status['queued'] and not status['running']:
+                break
+            running = status['running']
+            if running and running['epoch'] and running['epoch'] not in progress:
+                progress.append(running['epoch'])
+                if running['epoch'] == 2:
+                    for i in range(5):
+                        workers[i % 2].request(f'late edit {i}')
+            time.sleep(0.01)
+        same = workers[0].status() == status
+        for queue in workers:
+            queue.close()
+        pool.close()
+
+        # A run started while another holds the lock leaves the served files alone
+        lock_path = os.path.join(tmp, 'retrain.lock')
+        held = acquire_lock(lock_path)
+        skipped = retrain_run(lock_path=lock_path) is None
+        held.close()
+    runs = [(job['id'], job['state'], job['requests']) for job in reversed(status['history'])]
+    ok = (runs == [(1, 'published', 20), (2, 'published', 5)] and len(published) == 2 and progress[:2] == [1, 2]
+          and same and skipped)
+    print(f'25 requests over 2 workers -> runs {runs}; progress seen at epochs {progress}')
+    print(f'both workers report the same status: {same}; a second run is skipped while locked: {skipped}')
+    print(f'request() {max(timings):.0f} us worst case; merged {status["counts"]["merged"]}: {ok}')
+    return ok
+
+
+SECTIONS = {
+    'tokenizer': tokenizer,
+    'analysis': analysis,
+    'spelling': spelling,
+    'database': database,
+    'query_plans': query_plans,
+    'search': search,
+    'pagination': pagination,
+    'export': export,
+    'rollups': rollups,
+    'query_cache': query_cache,
+    'retrain_queue': retrain_queue
+}
+
+
+if __name__ == '__main__':
+    selected = sys.argv[1:] or list(SECTIONS)
+    ok = True
+    for name in selected:
+        print(f'== {name} ==')
+        ok = SECTIONS[name]() and ok
+    sys.exit(0 if ok else 1)
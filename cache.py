@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe bounded LRU cache with an optional per-entry TTL (seconds)"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._data)
+
+    def update(self, key, func):
+        """Replace a cached value with func(value), keeping its expiry and LRU
+        position; func returning None removes it. Not counted as a lookup.
+        func runs under the cache lock, so it must not use this cache."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return
+            value = func(entry[0])
+            if value is None:
+                del self._data[key]
+            else:
+                self._data[key] = (value, entry[1])
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+_MISSING = object()
+
+
+class QueryCache:
+    """Query results keyed by (name, *params), dropped or patched on writes
+
+    get() computes and caches a result on a miss. Write paths call
+    invalidate(name) to drop every cached variant of a query, or
+    update(name, func) to patch them in place (func(key, value) returns the
+    new value, or None to drop it) when the change is cheap to apply. The
+    TTL bounds staleness from writes this process doesn't see, e.g. other
+    workers or time windows moving on. A result whose query was invalidated
+    or updated while it was being computed is returned but not cached.
+    """
+
+    def __init__(self, maxsize=256, ttl=60):
+        self.cache = LRUCache(maxsize, ttl)
+        self.invalidations = {}
+        self.updates = {}
+        self.discarded = 0
+        # name -> count of invalidate()/update() calls, checked around compute()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self._generations.get(key[0], 0)
+            value = compute()
+            with self._lock:
+                if self._generations.get(key[0], 0) == generation:
+                    self.cache.set(key, value)
+                else:
+                    self.discarded += 1
+        return value
+
+    def _entries(self, name):
+        return [key for key in self.cache.keys() if key[0] == name]
+
+    def _bump(self, name):
+        self._generations[name] = self._generations.get(name, 0) + 1
+
+    def invalidate(self, *names):
+        with self._lock:
+            for name in names:
+                self._bump(name)
+                for key in self._entries(name):
+                    self.cache.pop(key)
+                self.invalidations[name] = self.invalidations.get(name, 0) + 1
+
+    def update(self, name, func):
+        with self._lock:
+            self._bump(name)
+            for key in self._entries(name):
+                self.cache.update(key, lambda value: func(key, value))
+            self.updates[name] = self.updates.get(name, 0) + 1
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update(invalidations=dict(self.invalidations), updates=dict(self.updates),
+                     discarded=self.discarded)
+        return stats
@@ -1,33 +1,26 @@
 import random
 import json
-import torch
 import speech_recognition as sr
 from gtts import gTTS
 import os
 
-from model import NeuralNet
-from nltk_utils import bag_of_words, tokenize
+from inference import load_classifier
+from nltk_utils import tokenize, set_tokenizer_mode, preload_stems
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+# Precompiled regex tokenizer: same bag-of-words as nltk.word_tokenize on the
+# intents corpus (see benchmark.py tokenizer) without loading punkt
+TOKENIZER_MODE = 'regex'
+set_tokenizer_mode(TOKENIZER_MODE)
 
 # Load the Kalapuraparambil Automobiles intents
 with open('kalapuraparambil_intents.json', 'r', encoding='utf-8') as json_data:
     intents = json.load(json_data)
+preload_stems(intents)
 
-# Load the trained model
+# Load the trained model (NumPy bundle if exported, otherwise the .pth file)
 FILE = "kalapuraparambil_data.pth"
-data = torch.load(FILE, map_location=torch.device('cpu'))
-
-input_size = data["input_size"]
-hidden_size = data["hidden_size"]
-output_size = data["output_size"]
-all_words = data['all_words']
-tags = data['tags']
-model_state = data["model_state"]
-
-model = NeuralNet(input_size, hidden_size, output_size).to(device)
-model.load_state_dict(model_state)
-model.eval()
+NUMPY_FILE = "kalapuraparambil_data.npz"
+classifier = load_classifier(FILE, NUMPY_FILE)
 
 bot_name = "Kalapuraparambil Auto Bot"
 print("Welcome to Kalapuraparambil Automobiles. We build more than vehicles – we build experiences! Let's chat! (type 'quit' to exit)")
@@ -75,19 +68,9 @@ while True:
         break
 
     sentence = tokenize(sentence)
-    X = bag_of_words(sentence, all_words)
-    X = X.reshape(1, X.shape[0])
-    X = torch.from_numpy(X).to(device)
-
-    output = model(X)
-    _, predicted = torch.max(output, dim=1)
-
-    tag = tags[predicted.item()]
-
-    probs = torch.softmax(output, dim=1)
-    prob = probs[0][predicted.item()]
+    tag, prob = classifier.predict(sentence)
 
-    if prob.item() > 0.75:
+    if prob > 0.75:
         flag = 0
         for intent in intents['intents']:
             if tag == intent["tag"]:
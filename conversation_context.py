@@ -0,0 +1,68 @@
+import time
+
+# A topic's weight is multiplied by TOPIC_TURN_DECAY for every later turn and
+# halves every TOPIC_HALF_LIFE seconds; it counts as mentioned while the
+# weight stays above TOPIC_MIN_WEIGHT (about six turns after one mention,
+# like the old six-message window)
+TOPIC_TURN_DECAY = 0.8
+TOPIC_HALF_LIFE = 1800
+TOPIC_MIN_WEIGHT = 0.25
+
+
+class ConversationContext:
+    """What the bot remembers about a conversation, updated once per turn
+
+    Replaces rescanning the recent history on every request: each turn
+    updates a few fields and the weight of the topics it mentions. Topic
+    weights decay lazily, so a turn costs O(topics in that turn).
+    """
+
+    __slots__ = ('turns', 'last_intent', 'last_user_message', 'last_bot_response', 'topics')
+
+    def __init__(self, turns=0, last_intent=None, last_user_message=None, last_bot_response=None, topics=None):
+        self.turns = turns
+        self.last_intent = last_intent
+        self.last_user_message = last_user_message
+        self.last_bot_response = last_bot_response
+        # topic -> [weight, turn, time] as of its last mention
+        self.topics = topics or {}
+
+    def topic_weight(self, topic, now=None):
+        entry = self.topics.get(topic)
+        if entry is None:
+            return 0.0
+        weight, turn, seen = entry
+        now = time.time() if now is None else now
+        return weight * TOPIC_TURN_DECAY ** (self.turns - turn) * 0.5 ** (max(now - seen, 0) / TOPIC_HALF_LIFE)
+
+    def add_user_turn(self, message, topics=(), now=None):
+        now = time.time() if now is None else now
+        for topic in topics:
+            self.topics[topic] = [self.topic_weight(topic, now) + 1, self.turns, now]
+        self.last_user_message = message
+        self.turns += 1
+
+    def add_bot_turn(self, message, intent=None):
+        self.last_bot_response = message
+        if intent is not None:
+            self.last_intent = intent
+        self.turns += 1
+
+    def mentioned_topics(self, now=None):
+        """Topics still above TOPIC_MIN_WEIGHT, strongest first; faded ones are dropped"""
+        now = time.time() if now is None else now
+        weights = {topic: self.topic_weight(topic, now) for topic in self.topics}
+        for topic, weight in weights.items():
+            if weight < TOPIC_MIN_WEIGHT:
+                del self.topics[topic]
+        return sorted((t for t in weights if t in self.topics), key=weights.get, reverse=True)
+
+    def is_active(self):
+        return self.last_intent is not None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data) if data else cls()
@@ -0,0 +1,96 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Applied once when a connection is opened instead of on every request
+PRAGMAS = (
+    ('journal_mode', 'WAL'),      # readers don't block the writer
+    ('synchronous', 'NORMAL'),    # fsync at checkpoints only; safe with WAL
+    ('cache_size', -16000),       # 16 MB page cache per connection
+    ('mmap_size', 268435456),     # read pages through a 256 MB memory map
+    ('temp_store', 'MEMORY'),
+)
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections, set up once and reused
+
+    Connections are opened lazily up to `size` and handed out one thread
+    at a time; when all are in use connection() waits up to `timeout`
+    seconds for one to come back.
+    """
+
+    def __init__(self, path, size=8, timeout=10.0, cached_statements=256, pragmas=PRAGMAS):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.pragmas = pragmas
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.checkouts = 0
+        self.waits = 0
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f'PRAGMA {name}={value}')
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self.opened < self.size:
+                self.opened += 1
+                try:
+                    return self._open()
+                except Exception:
+                    self.opened -= 1
+                    raise
+        self.waits += 1
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f'No database connection free after {self.timeout}s')
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success, rolls back on error"""
+        conn = self.acquire()
+        self.checkouts += 1
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close the idle connections, e.g. before replacing the database file"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self.opened -= 1
+
+    def stats(self):
+        return {'size': self.size, 'opened': self.opened, 'idle': self._idle.qsize(),
+                'checkouts': self.checkouts, 'waits': self.waits}
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import zlib
+
+from pagination import keyset_page, parse_cursor
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl')
+}
+
+# Flush encoded output to the client in pieces of about this many bytes
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def export_rows(connection, query, params=(), chunk_size=1000):
+    """Yield every row of `query`, newest first, reading chunk_size rows at a time
+
+    Each chunk is a keyset page on its own pooled connection, so a slow
+    download neither pins a connection nor holds a read transaction open.
+    """
+    before = None
+    while True:
+        with connection() as conn:
+            rows, cursor = keyset_page(conn, query, params, before, chunk_size)
+        yield from rows
+        if cursor is None:
+            return
+        before = parse_cursor(cursor)
+
+
+def select_columns(columns, names):
+    """Columns (key, header, formatter) limited to the comma-separated keys in
+    `names`, in that order; all of them if names is empty. KeyError on an unknown key"""
+    if not names:
+        return columns
+    by_key = {column[0]: column for column in columns}
+    return [by_key[name.strip()] for name in names.split(',') if name.strip()]
+
+
+def csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header, _ in columns])
+    for row in rows:
+        writer.writerow([row[key] if formatter is None else formatter(row[key]) for key, _, formatter in columns])
+        if buffer.tell() >= EXPORT_BUFFER_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def jsonl_chunks(rows, columns):
+    # Raw column values, keyed by column name; formatters are for the CSV view
+    parts = []
+    size = 0
+    for row in rows:
+        line = json.dumps({key: row[key] for key, _, _ in columns}, ensure_ascii=False, default=str) + '\n'
+        parts.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+    yield ''.join(parts).encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_export(rows, columns, export_format='csv', compress=False):
+    """Stream rows as CSV or JSON Lines bytes, optionally gzipped"""
+    chunks = csv_chunks(rows, columns) if export_format == 'csv' else jsonl_chunks(rows, columns)
+    return gzip_chunks(chunks) if compress else chunks
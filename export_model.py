@@ -0,0 +1,78 @@
+"""Export kalapuraparambil_data.pth to a torch-free NumPy bundle
+
+Usage: python export_model.py [checkpoint.pth] [bundle.npz]
+
+After writing the bundle the NumPy forward pass is checked against the
+torch model on every intent pattern (plus random inputs); the export fails
+if any probability differs by more than PARITY_TOLERANCE.
+"""
+import json
+import os
+import sys
+
+import numpy as np
+import torch
+
+from model import NeuralNet
+from nltk_utils import BagOfWords, tokenize
+from numpy_model import save_bundle, load_bundle, file_digest
+
+FILE = "kalapuraparambil_data.pth"
+NUMPY_FILE = "kalapuraparambil_data.npz"
+INTENTS_FILE = "kalapuraparambil_intents.json"
+
+PARITY_TOLERANCE = 1e-5
+
+
+def check_parity(data, numpy_path, intents_path=INTENTS_FILE, tolerance=PARITY_TOLERANCE):
+    """Return the max absolute probability difference between torch and NumPy"""
+    model = NeuralNet(data["input_size"], data["hidden_size"], data["output_size"])
+    model.load_state_dict(data["model_state"])
+    model.eval()
+
+    net, all_words, tags = load_bundle(numpy_path)
+    if all_words != list(data['all_words']) or tags != list(data['tags']):
+        raise ValueError("Exported vocabulary or tags do not match the checkpoint")
+
+    with open(intents_path, 'r', encoding='utf-8') as f:
+        intents = json.load(f)
+    featurizer = BagOfWords(all_words)
+    sentences = [tokenize(p) for intent in intents['intents'] for p in intent['patterns']]
+    X = np.zeros((len(sentences), featurizer.size), dtype=np.float32)
+    for row, sentence in zip(X, sentences):
+        featurizer.transform(sentence, out=row)
+
+    # Random binary inputs cover vocabulary combinations the patterns miss
+    rng = np.random.default_rng(0)
+    X = np.vstack([X, (rng.random((256, featurizer.size)) < 0.05).astype(np.float32)])
+
+    with torch.no_grad():
+        expected = torch.softmax(model(torch.from_numpy(X)), dim=1).numpy()
+    actual = net.predict_proba(X)
+
+    max_diff = float(np.abs(expected - actual).max())
+    if max_diff > tolerance:
+        raise ValueError(f"NumPy engine differs from torch by {max_diff:.2e} (tolerance {tolerance:.0e})")
+    if not np.array_equal(expected.argmax(axis=1), actual.argmax(axis=1)):
+        raise ValueError("NumPy engine predicts different tags than torch")
+    return max_diff
+
+
+def export_numpy_bundle(checkpoint=FILE, numpy_path=NUMPY_FILE):
+    data = torch.load(checkpoint, map_location=torch.device('cpu'))
+    model_state = {name: tensor.cpu().numpy() for name, tensor in data["model_state"].items()}
+    # Write next to the target and only replace it once parity holds
+    tmp_path = numpy_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        save_bundle(f, model_state, data['all_words'], data['tags'], file_digest(checkpoint))
+    try:
+        max_diff = check_parity(data, tmp_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, numpy_path)
+    print(f'exported {checkpoint} to {numpy_path} (max probability difference {max_diff:.2e})')
+
+
+if __name__ == '__main__':
+    export_numpy_bundle(*sys.argv[1:3])
@@ -0,0 +1,91 @@
+import threading
+import time
+
+# Version row bumped by triggers on every change to the holidays table. Any
+# process can compare it with the version it loaded to know when to reload.
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS holiday_calendar_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO holiday_calendar_version (id, version) VALUES (1, 0);
+    CREATE TRIGGER IF NOT EXISTS holidays_version_insert AFTER INSERT ON holidays BEGIN
+        UPDATE holiday_calendar_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS holidays_version_update AFTER UPDATE ON holidays BEGIN
+        UPDATE holiday_calendar_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS holidays_version_delete AFTER DELETE ON holidays BEGIN
+        UPDATE holiday_calendar_version SET version = version + 1 WHERE id = 1;
+    END;
+'''
+
+
+def create_schema(conn):
+    """Create the version row and its triggers (the holidays table must exist)"""
+    conn.executescript(SCHEMA)
+
+
+class HolidayCalendar:
+    """In-process 'YYYY-MM-DD' -> holiday map so lookups never touch the database
+
+    reload() reads the table and its version in one snapshot. The process
+    that edits holidays reloads right away; every other worker notices the
+    version change from a background poll within poll_interval seconds.
+    """
+
+    def __init__(self, connection, poll_interval=30):
+        self.connection = connection
+        self.poll_interval = poll_interval
+        self.version = None
+        self.loaded_at = None
+        self._holidays = {}
+        self._lock = threading.Lock()
+
+    def get(self, date_str):
+        return self._holidays.get(date_str)
+
+    def __len__(self):
+        return len(self._holidays)
+
+    def _read_version(self, conn):
+        row = conn.execute('SELECT version FROM holiday_calendar_version WHERE id = 1').fetchone()
+        return row[0] if row else 0
+
+    def reload(self):
+        with self._lock:
+            with self.connection() as conn:
+                conn.execute('BEGIN')
+                version = self._read_version(conn)
+                rows = conn.execute('SELECT id, date, name, description FROM holidays').fetchall()
+                conn.commit()
+            # Swap in a new dict; readers never see a half-built map
+            self._holidays = {row['date']: dict(row) for row in rows}
+            self.version = version
+            self.loaded_at = time.time()
+
+    def refresh(self):
+        """Reload if the table changed since the last load; True if it did"""
+        with self.connection() as conn:
+            version = self._read_version(conn)
+        if version == self.version:
+            return False
+        self.reload()
+        return True
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing holiday calendar: {e}")
+
+    def start(self):
+        """Start the background poll (no-op when poll_interval is falsy)"""
+        if self.poll_interval:
+            threading.Thread(target=self.watch, name='holiday-calendar', daemon=True).start()
+
+    def stats(self):
+        return {'holidays': len(self._holidays), 'version': self.version,
+                'loaded_at': self.loaded_at, 'poll_interval': self.poll_interval}
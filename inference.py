@@ -0,0 +1,312 @@
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from cache import LRUCache
+from nltk_utils import BagOfWords, tokenize
+from numpy_model import load_bundle, bundle_source_digest, file_digest
+
+
+class TorchEngine:
+    """Runs model.NeuralNet from a .pth checkpoint; torch is only imported here"""
+
+    def __init__(self, model_state, input_size, hidden_size, output_size, device=None):
+        import torch
+        from model import NeuralNet
+
+        self.torch = torch
+        self.device = device or torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model = NeuralNet(input_size, hidden_size, output_size).to(self.device)
+        self.model.load_state_dict(model_state)
+        self.model.eval()
+
+    def predict_proba(self, X):
+        torch = self.torch
+        with torch.no_grad():
+            output = self.model(torch.from_numpy(X).to(self.device))
+            return torch.softmax(output, dim=1).cpu().numpy()
+
+
+class IntentClassifier:
+    """Featurizer, network and tag list loaded from one training checkpoint
+
+    The network is any engine exposing predict_proba(X) -> probabilities:
+    numpy_model.NumpyNeuralNet for the torch-free web path, or TorchEngine.
+
+    An optional prediction cache is keyed on the sorted in-vocabulary stem
+    indices, which is all the network ever sees. It belongs to this
+    classifier, so loading a new model or vocabulary starts with it empty.
+    """
+
+    def __init__(self, engine, all_words, tags, cache=None):
+        self.engine = engine
+        self.all_words = all_words
+        self.tags = tags
+        self.featurizer = BagOfWords(all_words)
+        self.cache = cache
+
+    @classmethod
+    def from_checkpoint(cls, path, device=None, cache=None):
+        import torch
+
+        data = torch.load(path, map_location=torch.device('cpu'))
+        engine = TorchEngine(data["model_state"], data["input_size"],
+                             data["hidden_size"], data["output_size"], device)
+        return cls(engine, data['all_words'], data['tags'], cache)
+
+    @classmethod
+    def from_numpy_bundle(cls, path, cache=None):
+        engine, all_words, tags = load_bundle(path)
+        return cls(engine, all_words, tags, cache)
+
+    def featurize(self, tokenized_sentences):
+        """Build one (n, vocab) feature matrix for a list of tokenized sentences"""
+        X = np.zeros((len(tokenized_sentences), self.featurizer.size), dtype=np.float32)
+        for row, sentence in zip(X, tokenized_sentences):
+            self.featurizer.transform(sentence, out=row)
+        return X
+
+    def cache_key(self, tokenized_sentence):
+        """Canonical model input: the sorted set of in-vocabulary stem indices"""
+        return tuple(self.featurizer.indices(tokenized_sentence))
+
+    def vector(self, key):
+        """Feature vector for a cache key"""
+        x = np.zeros(self.featurizer.size, dtype=np.float32)
+        x[list(key)] = 1
+        return x
+
+    def predict_proba(self, X):
+        """Run one forward pass and one softmax over a feature matrix"""
+        return self.engine.predict_proba(X)
+
+    def result(self, probs):
+        """(tag, confidence) for one row of probabilities"""
+        predicted = int(probs.argmax())
+        return self.tags[predicted], float(probs[predicted])
+
+    def predict(self, tokenized_sentence):
+        """Return (tag, confidence) for a single tokenized sentence"""
+        key = self.cache_key(tokenized_sentence)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = self.result(self.predict_proba(self.vector(key).reshape(1, -1))[0])
+        if self.cache is not None:
+            self.cache.set(key, result)
+        return result
+
+    def predict_batch(self, messages, top_k=3):
+        """Classify raw messages in one batch, returning tag, confidence and top-k for each"""
+        if not messages:
+            return []
+        probs = self.predict_proba(self.featurize([tokenize(m) for m in messages]))
+        top_k = max(1, min(top_k, len(self.tags)))
+        ranked = np.argsort(-probs, axis=1, kind='stable')[:, :top_k]
+
+        results = []
+        for message, row, order in zip(messages, probs, ranked):
+            results.append({
+                'message': message,
+                'tag': self.tags[order[0]],
+                'confidence': float(row[order[0]]),
+                'top_k': [{'tag': self.tags[i], 'confidence': float(row[i])} for i in order]
+            })
+        return results
+
+
+def bundle_is_current(numpy_bundle, checkpoint):
+    """True unless the checkpoint changed after the bundle was exported from it
+
+    Bundles stamped with the checkpoint digest are compared by content;
+    older bundles only count as current if they are not older than the
+    checkpoint file.
+    """
+    if not os.path.exists(checkpoint):
+        return True
+    source = bundle_source_digest(numpy_bundle)
+    if source is not None:
+        return source == file_digest(checkpoint)
+    return os.path.getmtime(numpy_bundle) >= os.path.getmtime(checkpoint)
+
+
+def load_classifier(checkpoint, numpy_bundle=None, backend='numpy', cache_size=0, cache_ttl=None):
+    """Load the NumPy bundle when requested, present and exported from the
+    current checkpoint, otherwise the torch checkpoint"""
+    cache = LRUCache(cache_size, cache_ttl) if cache_size else None
+    if backend == 'numpy' and numpy_bundle and os.path.exists(numpy_bundle):
+        if bundle_is_current(numpy_bundle, checkpoint):
+            print(f"Loading model from {numpy_bundle}")
+            return IntentClassifier.from_numpy_bundle(numpy_bundle, cache)
+        print(f"{numpy_bundle} was not exported from the current {checkpoint}; loading the checkpoint with torch "
+              f"(run export_model.py to refresh the bundle)")
+    print(f"Loading model from {checkpoint}")
+    return IntentClassifier.from_checkpoint(checkpoint, cache=cache)
+
+
+# One immutable, self-consistent snapshot of everything a request needs.
+# It is replaced as a whole on reload, never mutated in place.
+ModelBundle = namedtuple('ModelBundle', ['classifier', 'intents', 'catalog', 'speller', 'search', 'version', 'loaded_at'])
+
+
+def validate_classifier(classifier, intents):
+    """Raise ValueError unless the classifier is usable with these intents"""
+    if len(set(classifier.tags)) != len(classifier.tags):
+        raise ValueError("Duplicate tags in checkpoint")
+    intent_tags = {intent['tag'] for intent in intents['intents']}
+    missing = [tag for tag in classifier.tags if tag not in intent_tags]
+    if missing:
+        raise ValueError(f"Tags without an intent: {', '.join(missing)}")
+
+    patterns = [p for intent in intents['intents'] for p in intent['patterns']][:64]
+    probs = classifier.predict_proba(classifier.featurize([tokenize(p) for p in patterns]))
+    if probs.shape != (len(patterns), len(classifier.tags)):
+        raise ValueError(f"Model output shape {probs.shape} does not match {len(classifier.tags)} tags")
+    if not np.all(np.isfinite(probs)):
+        raise ValueError("Model produced non-finite probabilities")
+
+
+class _PendingPrediction:
+    __slots__ = ('classifier', 'x', 'enqueued', 'done', 'probs', 'error')
+
+    def __init__(self, classifier, x):
+        self.classifier = classifier
+        self.x = x
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.probs = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Collects concurrent single-sentence predictions into one forward pass
+
+    Requests wait at most `window_ms` (or until `max_batch_size` requests are
+    queued) before their bag-of-words vectors are stacked and run through the
+    network together. When fewer than `bypass_below` requests are in flight the
+    prediction runs inline, so a lightly loaded server pays no queueing delay.
+    """
+
+    def __init__(self, window_ms=2.0, max_batch_size=32, bypass_below=2):
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.bypass_below = bypass_below
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {
+            'requests': 0,
+            'bypassed': 0,
+            'batches': 0,
+            'batched_requests': 0,
+            'max_batch_size': 0,
+            'queue_time_total': 0.0,
+            'queue_time_max': 0.0
+        }
+
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def predict(self, classifier, tokenized_sentence):
+        """Return (tag, confidence), sharing the forward pass with concurrent callers"""
+        key = classifier.cache_key(tokenized_sentence)
+        if classifier.cache is not None:
+            cached = classifier.cache.get(key)
+            if cached is not None:
+                return cached
+        x = classifier.vector(key)
+
+        with self._lock:
+            self._in_flight += 1
+            self._counters['requests'] += 1
+            bypass = self._in_flight < self.bypass_below
+            if bypass:
+                self._counters['bypassed'] += 1
+
+        try:
+            if bypass:
+                probs = classifier.predict_proba(x.reshape(1, -1))[0]
+            else:
+                pending = _PendingPrediction(classifier, x)
+                self._queue.put(pending)
+                pending.done.wait()
+                if pending.error is not None:
+                    raise pending.error
+                probs = pending.probs
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+        result = classifier.result(probs)
+        if classifier.cache is not None:
+            classifier.cache.set(key, result)
+        return result
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first.enqueued + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        # Window closed: still take whatever is already queued
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        started = time.perf_counter()
+        # Requests queued across a model reload keep the classifier they started with
+        groups = {}
+        for pending in batch:
+            groups.setdefault(id(pending.classifier), []).append(pending)
+        for group in groups.values():
+            try:
+                probs = group[0].classifier.predict_proba(np.stack([pending.x for pending in group]))
+                for pending, row in zip(group, probs):
+                    pending.probs = row
+            except Exception as e:
+                for pending in group:
+                    pending.error = e
+
+        with self._lock:
+            counters = self._counters
+            counters['batches'] += 1
+            counters['batched_requests'] += len(batch)
+            counters['max_batch_size'] = max(counters['max_batch_size'], len(batch))
+            for pending in batch:
+                waited = started - pending.enqueued
+                counters['queue_time_total'] += waited
+                counters['queue_time_max'] = max(counters['queue_time_max'], waited)
+
+        for pending in batch:
+            pending.done.set()
+
+    def stats(self):
+        """Return batch-size and queue-time counters"""
+        with self._lock:
+            counters = dict(self._counters)
+            in_flight = self._in_flight
+        batched = counters['batched_requests']
+        return {
+            'requests': counters['requests'],
+            'bypassed': counters['bypassed'],
+            'batches': counters['batches'],
+            'in_flight': in_flight,
+            'avg_batch_size': round(batched / counters['batches'], 2) if counters['batches'] else 0,
+            'max_batch_size': counters['max_batch_size'],
+            'avg_queue_time_ms': round(counters['queue_time_total'] / batched * 1000, 3) if batched else 0,
+            'max_queue_time_ms': round(counters['queue_time_max'] * 1000, 3)
+        }
@@ -0,0 +1,139 @@
+import re
+from collections import namedtuple
+
+# Phrases that mean the user wants to see pictures
+IMAGE_KEYWORDS = ['image', 'images', 'photo', 'photos', 'picture', 'pictures', 'show me', 'example', 'examples', 'see', 'look', 'view', 'gallery', 'portfolio']
+
+# Gallery category -> phrases; the first category (in this order) that matches wins
+CATEGORY_KEYWORDS = {
+    'urbania': ['urbania'],
+    'caravan': ['caravan', 'mobile home', 'home on wheels'],
+    'traveller': ['traveller', 'tourist', 'tour'],
+    'icu': ['icu', 'ambulance', 'medical', 'hospital'],
+    'interior': ['interior', 'luxury', 'wood', 'fiber'],
+    'campaign': ['campaign', 'election', 'political']
+}
+
+# Conversation topics remembered as context
+TOPIC_KEYWORDS = {
+    'force_urbania': ['urbania'],
+    'caravan': ['caravan'],
+    'force_traveller': ['traveller'],
+    'pricing': ['price', 'cost']
+}
+
+# Unicode blocks for language detection, in priority order
+SCRIPT_RANGES = [
+    ('ml', '\u0D00', '\u0D7F'),  # Malayalam
+    ('ta', '\u0B80', '\u0BFF'),  # Tamil
+    ('kn', '\u0C80', '\u0CFF'),  # Kannada
+    ('hi', '\u0900', '\u097F'),  # Hindi/Devanagari
+]
+
+MessageAnalysis = namedtuple('MessageAnalysis', ['wants_images', 'category', 'topics', 'language'])
+
+
+def trie_pattern(keywords):
+    """Regex source matching any keyword, nested as a trie so each position is
+    rejected after one character instead of trying every alternative"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class MessageAnalyzer:
+    """Single-pass matcher for image requests, vehicle category, topics and script
+
+    All keywords are compiled into one trie-shaped regex, and code points in
+    the Indic script blocks are picked up by the same scan. Matching is by
+    substring, like the `keyword in text` checks it replaces: a lookahead
+    reports every position where a keyword starts, and each keyword carries
+    the labels of the shorter keywords it begins with, so prefixes are never
+    lost.
+    """
+
+    def __init__(self, image_keywords=IMAGE_KEYWORDS, category_keywords=CATEGORY_KEYWORDS,
+                 topic_keywords=TOPIC_KEYWORDS, script_ranges=SCRIPT_RANGES):
+        labels = {}
+        for keyword in image_keywords:
+            labels.setdefault(keyword, set()).add(('image', None))
+        self.categories = list(category_keywords)
+        for rank, keywords in enumerate(category_keywords.values()):
+            for keyword in keywords:
+                labels.setdefault(keyword, set()).add(('category', rank))
+        for topic, keywords in topic_keywords.items():
+            for keyword in keywords:
+                labels.setdefault(keyword, set()).add(('topic', topic))
+
+        self._labels = {}
+        for keyword in labels:
+            merged = set()
+            for other, other_labels in labels.items():
+                if keyword.startswith(other):
+                    merged |= other_labels
+            self._labels[keyword] = (
+                any(kind == 'image' for kind, _ in merged),
+                min((rank for kind, rank in merged if kind == 'category'), default=None),
+                frozenset(topic for kind, topic in merged if kind == 'topic')
+            )
+
+        self.scripts = [code for code, _, _ in script_ranges]
+        self._script_rank = {}
+        char_class = ''
+        for rank, (_, low, high) in enumerate(script_ranges):
+            char_class += f'{low}-{high}'
+            for codepoint in range(ord(low), ord(high) + 1):
+                self._script_rank.setdefault(chr(codepoint), rank)
+
+        self._pattern = re.compile(f'(?=({trie_pattern(self._labels)}))|([{char_class}])')
+        self._script_pattern = re.compile(f'[{char_class}]')
+
+    def analyze(self, text):
+        """Return MessageAnalysis(wants_images, category, topics, language) for one message"""
+        wants_images = False
+        category_rank = None
+        topics = set()
+        script_rank = None
+
+        labels = self._labels
+        script_ranks = self._script_rank
+        for keyword, char in self._pattern.findall(text.lower()):
+            if keyword:
+                images, rank, keyword_topics = labels[keyword]
+                wants_images = wants_images or images
+                if rank is not None and (category_rank is None or rank < category_rank):
+                    category_rank = rank
+                if keyword_topics:
+                    topics |= keyword_topics
+            else:
+                rank = script_ranks[char]
+                if script_rank is None or rank < script_rank:
+                    script_rank = rank
+
+        return MessageAnalysis(
+            wants_images,
+            self.categories[category_rank] if category_rank is not None else None,
+            topics,
+            self.scripts[script_rank] if script_rank is not None else 'en'
+        )
+
+    def language(self, text):
+        """Script-based language code ('en' when no Indic script is present)"""
+        best = None
+        for char in self._script_pattern.findall(text):
+            rank = self._script_rank[char]
+            if best is None or rank < best:
+                best = rank
+        return self.scripts[best] if best is not None else 'en'
@@ -0,0 +1,35 @@
+def schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(conn, migrations):
+    """Apply every (version, function) newer than PRAGMA user_version, in order
+
+    Each migration runs in its own transaction together with the
+    user_version bump, so a failed step leaves the database at the last
+    good version. Migrations must not commit themselves. Returns the list
+    of versions applied.
+    """
+    applied = []
+    current = schema_version(conn)
+    for version, migration in sorted(migrations, key=lambda m: m[0]):
+        if version <= current:
+            continue
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another worker may have migrated while we waited for the lock
+            if schema_version(conn) >= version:
+                conn.rollback()
+                current = schema_version(conn)
+                continue
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        current = version
+        applied.append(version)
+    return applied
@@ -1,16 +1,100 @@
+import re
+from functools import lru_cache
+
 import numpy as np
 import nltk
 # For the first time running the program please uncomment below line
+# (only needed for the 'nltk' tokenizer mode)
 #nltk.download('punkt')
 from nltk.stem.porter import PorterStemmer
 stemmer = PorterStemmer()
 
-def tokenize(sentence):
+# Porter stemming is slow pure Python while the domain vocabulary is small and
+# repetitive, so stems are memoized (bounded) for the whole process
+STEM_CACHE_SIZE = 16384
+
+# Tokenizer used by tokenize(): 'nltk' (nltk.word_tokenize, needs punkt) or
+# 'regex' (precompiled pattern below, no model loading). Change it with
+# set_tokenizer_mode().
+TOKENIZER_MODE = 'nltk'
+
+# Mirrors the Treebank rules nltk.word_tokenize applies to chat-sized input:
+# "n't" and clitics ('s, 're, ...) are split off, '.', ',' and ':' stay inside
+# a word only when followed by more word characters, other punctuation
+# becomes its own token.
+_WORD_CHAR = r"""[^\s.,:;@#$%&?!()\[\]{}<>"'`]"""
+TOKEN_PATTERN = re.compile(
+    r"\w+(?=n't\b)|n't\b|'(?:s|re|ve|ll|d|m)\b|\.\.\.|--|"
+    + _WORD_CHAR + r"+(?:(?:[.,:]|'(?!(?:s|re|ve|ll|d|m|t)\b))" + _WORD_CHAR + r"+)*|\S",
+    re.IGNORECASE)
+
+
+def nltk_tokenize(sentence):
     return nltk.word_tokenize(sentence)
 
 
+def regex_tokenize(sentence):
+    return TOKEN_PATTERN.findall(sentence)
+
+
+TOKENIZERS = {
+    'nltk': nltk_tokenize,
+    'regex': regex_tokenize
+}
+_tokenizer = TOKENIZERS[TOKENIZER_MODE]
+
+
+def set_tokenizer_mode(mode):
+    global TOKENIZER_MODE, _tokenizer
+    if mode not in TOKENIZERS:
+        raise ValueError(f"Unknown tokenizer mode: {mode}")
+    TOKENIZER_MODE = mode
+    _tokenizer = TOKENIZERS[mode]
+
+
+def tokenize(sentence):
+    return _tokenizer(sentence)
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def _stem_lowercase(word):
+    return stemmer.stem(word)
+
+
 def stem(word):
-    return stemmer.stem(word.lower())
+    return _stem_lowercase(word.lower())
+
+
+# faq_patterns keys are stored in the database, so they are always built with
+# the same tokenizer whatever set_tokenizer_mode() the process chose
+QUESTION_TOKENIZER_MODE = 'regex'
+
+
+def normalize_question(sentence):
+    """Canonical form of a question: stemmed tokens without punctuation, so
+    'What is the price?' and 'what is the PRICE' are the same question"""
+    words = TOKENIZERS[QUESTION_TOKENIZER_MODE](sentence)
+    return ' '.join(stem(word) for word in words if any(c.isalnum() for c in word))
+
+
+def preload_stems(intents):
+    """Seed the stem cache with every token in the intents file"""
+    for intent in intents['intents']:
+        for text in intent['patterns'] + intent['responses']:
+            for word in tokenize(text):
+                stem(word)
+
+
+def stem_cache_stats():
+    info = _stem_lowercase.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_rate': round(info.hits / lookups, 4) if lookups else 0
+    }
 
 
 def bag_of_words(tokenized_sentence, words):
@@ -21,3 +105,37 @@ def bag_of_words(tokenized_sentence, words):
             bag[idx] = 1
 
     return bag
+
+
+class BagOfWords:
+    """Featurizer built once from all_words with a word -> index hash map
+
+    Produces exactly the same vectors as bag_of_words, but costs time
+    proportional to the sentence length instead of the vocabulary size.
+    """
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.word_to_index = {w: idx for idx, w in enumerate(self.words)}
+        if len(self.word_to_index) != len(self.words):
+            raise ValueError("all_words must not contain duplicates")
+        self.size = len(self.words)
+
+    def indices(self, tokenized_sentence):
+        """Return the sorted indices of the vocabulary words present in the sentence"""
+        word_to_index = self.word_to_index
+        active = set()
+        for word in tokenized_sentence:
+            idx = word_to_index.get(stem(word))
+            if idx is not None:
+                active.add(idx)
+        return sorted(active)
+
+    def transform(self, tokenized_sentence, out=None):
+        """Return the bag-of-words vector, filling a zeroed `out` in place if given"""
+        if out is None:
+            out = np.zeros(self.size, dtype=np.float32)
+        for idx in self.indices(tokenized_sentence):
+            out[idx] = 1
+        return out
+
@@ -0,0 +1,78 @@
+import hashlib
+
+import numpy as np
+
+# Layer names as they appear in NeuralNet.state_dict()
+LAYERS = ('l1', 'l2', 'l3')
+
+
+def softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class NumpyNeuralNet:
+    """Pure-NumPy forward pass of model.NeuralNet (Linear -> ReLU -> Linear -> ReLU -> Linear)"""
+
+    def __init__(self, weights):
+        # Store transposed weights so the forward pass is a plain X @ W
+        self.layers = [
+            (np.ascontiguousarray(weights[f'{name}.weight'].T, dtype=np.float32),
+             np.asarray(weights[f'{name}.bias'], dtype=np.float32))
+            for name in LAYERS
+        ]
+        self.input_size = self.layers[0][0].shape[0]
+        self.output_size = self.layers[-1][0].shape[1]
+
+    def forward(self, X):
+        out = X
+        last = len(self.layers) - 1
+        for idx, (weight, bias) in enumerate(self.layers):
+            out = out @ weight + bias
+            if idx != last:
+                np.maximum(out, 0, out=out)
+        return out
+
+    def predict_proba(self, X):
+        return softmax(self.forward(np.asarray(X, dtype=np.float32)))
+
+
+# Bundle entries that are not layer weights
+METADATA_KEYS = ('all_words', 'tags', 'source_digest')
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, used to tie a bundle to its checkpoint"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_bundle(path, model_state, all_words, tags, source_digest=None):
+    """Write weights, vocabulary and tags to a NumPy .npz bundle, stamped
+    with the digest of the checkpoint it was exported from if given"""
+    arrays = {name: np.asarray(value, dtype=np.float32) for name, value in model_state.items()}
+    if source_digest is not None:
+        arrays['source_digest'] = np.array(source_digest)
+    np.savez(path,
+             all_words=np.array(all_words, dtype=str),
+             tags=np.array(tags, dtype=str),
+             **arrays)
+
+
+def bundle_source_digest(path):
+    """Checkpoint digest stamped by save_bundle; None for bundles without one"""
+    with np.load(path, allow_pickle=False) as bundle:
+        return str(bundle['source_digest']) if 'source_digest' in bundle.files else None
+
+
+def load_bundle(path):
+    """Load a bundle written by save_bundle, returning (net, all_words, tags)"""
+    with np.load(path, allow_pickle=False) as bundle:
+        weights = {key: bundle[key] for key in bundle.files if key not in METADATA_KEYS}
+        all_words = bundle['all_words'].tolist()
+        tags = bundle['tags'].tolist()
+    return NumpyNeuralNet(weights), all_words, tags
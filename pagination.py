@@ -0,0 +1,65 @@
+CURSOR_SEPARATOR = '|'
+
+
+def make_cursor(row):
+    return f"{row['timestamp']}{CURSOR_SEPARATOR}{row['id']}"
+
+
+def parse_cursor(value):
+    """'<timestamp>|<id>' -> (timestamp, id); None if missing or malformed"""
+    if not value or CURSOR_SEPARATOR not in value:
+        return None
+    timestamp, _, row_id = value.rpartition(CURSOR_SEPARATOR)
+    try:
+        return timestamp, int(row_id)
+    except ValueError:
+        return None
+
+
+def page_limit(value, default, maximum):
+    """Clamp a requested page size to 1..maximum"""
+    if value is None:
+        return default
+    return min(max(value, 1), maximum)
+
+
+def keyset_page(conn, query, params, before=None, limit=50):
+    """One page of `query` rows, newest first, older than cursor `before`
+
+    `query` must be a SELECT with a WHERE clause over a table with timestamp
+    and id columns. Rows are ordered by (timestamp, id) and the next page
+    starts strictly after the last row returned, so with an index on
+    timestamp every page costs the same however deep it is (unlike OFFSET).
+    Returns (rows, cursor for the next page or None on the last page).
+    """
+    params = list(params)
+    if before is not None:
+        query += ' AND (timestamp, id) < (?, ?)'
+        params.extend(before)
+    query += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+    rows = conn.execute(query, params).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], make_cursor(rows[limit - 1])
+    return rows, None
+
+
+def parse_offset(value):
+    """Offset cursor of a ranked listing -> int; 0 if missing or malformed"""
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def offset_page(conn, query, params, offset=0, limit=50):
+    """One page of an already ordered `query` (e.g. search results by rank),
+    starting at `offset`
+
+    For orderings with no stable keyset to resume from. Returns (rows,
+    offset cursor for the next page or None on the last page).
+    """
+    rows = conn.execute(query + ' LIMIT ? OFFSET ?', list(params) + [limit + 1, offset]).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], str(offset + limit)
+    return rows, None
@@ -0,0 +1,424 @@
+"""Background retraining of the intent classifier
+
+The admin training-data editor queues runs with RetrainQueue, which starts
+this file as a separate process so training never runs in (or imports
+torch into) the web workers. The child trains a candidate with train.py's
+batch mode (with the app's tokenizer), exports and validates it, and
+publishes it over the served checkpoint only if its accuracy on the
+patterns of the intents both models know is not below the served model's.
+Progress is written to stdout as JSON lines. Each run writes its own
+candidate files and holds an exclusive lock on LOCK_FILE, so two runs
+(e.g. from two gunicorn workers, or one started by hand) never share or
+publish each other's candidates; a run that finds the lock taken exits as
+"skipped".
+
+To retrain by hand the same way:
+
+    python retrain.py [--intents intents.json] [--tokenizer regex|nltk]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, run a single worker
+    fcntl = None
+
+FILE = "kalapuraparambil_data.pth"
+NUMPY_FILE = "kalapuraparambil_data.npz"
+INTENTS_FILE = 'kalapuraparambil_intents.json'
+LOCK_FILE = 'kalapuraparambil_data.retrain.lock'
+
+MAX_EPOCHS = 1000
+PATIENCE = 50
+# How far the candidate's accuracy may fall below the served model's and still be published
+ACCURACY_TOLERANCE = 0.0
+# Train and score with the tokenizer the app serves with (app.py passes its own)
+TOKENIZER_MODE = 'regex'
+
+RETRAIN_SCRIPT = os.path.abspath(__file__)
+
+
+def emit(event, **fields):
+    print(json.dumps(dict(fields, event=event)), flush=True)
+
+
+def candidate_path(path):
+    """A new, empty file next to `path` for this run's candidate"""
+    root, ext = os.path.splitext(os.path.basename(path))
+    fd, candidate = tempfile.mkstemp(suffix=f'.candidate{ext}', prefix=f'{root}.',
+                                     dir=os.path.dirname(os.path.abspath(path)))
+    os.close(fd)
+    return candidate
+
+
+def acquire_lock(path):
+    """Open and exclusively lock `path`; the open file, or None if another run holds it"""
+    f = open(path, 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return None
+    return f
+
+
+def pattern_accuracy(classifier, intents, tags=None):
+    """Share of intent patterns (of `tags` only, if given) the classifier
+    assigns to their own tag"""
+    from nltk_utils import tokenize
+
+    sentences = []
+    expected = []
+    for intent in intents['intents']:
+        if tags is not None and intent['tag'] not in tags:
+            continue
+        for pattern in intent['patterns']:
+            sentences.append(tokenize(pattern))
+            expected.append(intent['tag'])
+    if not sentences:
+        return 0.0
+    probs = classifier.predict_proba(classifier.featurize(sentences))
+    hits = sum(classifier.tags[i] == tag for i, tag in zip(probs.argmax(axis=1), expected))
+    return hits / len(sentences)
+
+
+def run(intents_path=INTENTS_FILE, checkpoint=FILE, numpy_path=NUMPY_FILE,
+        epochs=MAX_EPOCHS, patience=PATIENCE, tolerance=ACCURACY_TOLERANCE, tokenizer_mode=TOKENIZER_MODE,
+        lock_path=LOCK_FILE):
+    """Train, validate and publish (or reject) one candidate checkpoint;
+    True if published, False if rejected, None if another run holds the lock"""
+    lock = acquire_lock(lock_path)
+    if lock is None:
+        emit('skipped', message='Another retrain is already running')
+        return None
+    with lock:
+        return train_and_publish(intents_path, checkpoint, numpy_path, epochs, patience, tolerance, tokenizer_mode)
+
+
+def train_and_publish(intents_path, checkpoint, numpy_path, epochs, patience, tolerance, tokenizer_mode):
+    import torch
+    from nltk_utils import set_tokenizer_mode
+    from train import build_training_data, train_batches, save_checkpoint, HIDDEN_SIZE
+    from model import NeuralNet
+    from export_model import export_numpy_bundle
+    from inference import load_classifier, validate_classifier
+
+    set_tokenizer_mode(tokenizer_mode)
+    # One snapshot of the intents for the whole run; later edits queue another run
+    with open(intents_path, 'r', encoding='utf-8') as f:
+        intents = json.load(f)
+    all_words, tags, X, y = build_training_data(intents)
+    emit('started', patterns=len(X), tags=len(tags), max_epochs=epochs)
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = NeuralNet(len(all_words), HIDDEN_SIZE, len(tags)).to(device)
+    history = train_batches(model, X, y, device, num_epochs=epochs, patience=patience,
+                            on_epoch=lambda epoch, loss, val_loss: emit('epoch', epoch=epoch, loss=loss))
+
+    candidate = candidate_path(checkpoint)
+    candidate_numpy = candidate_path(numpy_path)
+    try:
+        save_checkpoint(model, all_words, tags, candidate)
+        export_numpy_bundle(candidate, candidate_numpy)
+        classifier = load_classifier(candidate, candidate_numpy)
+        validate_classifier(classifier, intents)
+        accuracy = pattern_accuracy(classifier, intents)
+
+        # Both models are scored on the patterns of the tags they share, so
+        # adding or deleting an intent still has to keep the others as good.
+        # Only with no served model at all is there nothing to compare with.
+        result = dict(loss=history['loss'], accuracy=accuracy)
+        if os.path.exists(checkpoint) or os.path.exists(numpy_path):
+            served = load_classifier(checkpoint, numpy_path)
+            shared = set(served.tags) & set(classifier.tags)
+            compared = pattern_accuracy(classifier, intents, shared)
+            baseline = pattern_accuracy(served, intents, shared)
+            result.update(compared_accuracy=compared, baseline_accuracy=baseline)
+            if compared < baseline - tolerance:
+                emit('rejected', message=f'Accuracy on the {len(shared)} existing intents fell to {compared:.1%} '
+                                         f'from the served model\'s {baseline:.1%}', **result)
+                return False
+
+        os.replace(candidate_numpy, numpy_path)
+        os.replace(candidate, checkpoint)
+        emit('published', message=f'Published a model with {accuracy:.1%} accuracy', **result)
+        return True
+    finally:
+        for path in (candidate, candidate_numpy):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# Jobs shared by every worker; the child's events fill in the result columns
+SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS retrain_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        state TEXT NOT NULL,
+        requests INTEGER NOT NULL DEFAULT 0,
+        reasons TEXT NOT NULL DEFAULT '[]',
+        requested_at TEXT NOT NULL,
+        start_after REAL NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        heartbeat REAL,
+        epoch INTEGER,
+        max_epochs INTEGER,
+        loss REAL,
+        accuracy REAL,
+        compared_accuracy REAL,
+        baseline_accuracy REAL,
+        message TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_retrain_jobs_state ON retrain_jobs (state, id)'
+]
+
+RESULT_FIELDS = ('loss', 'accuracy', 'compared_accuracy', 'baseline_accuracy', 'message')
+FINAL_STATES = ('published', 'rejected', 'failed', 'skipped')
+# Finished jobs kept in retrain_jobs
+KEEP_JOBS = 100
+
+
+def create_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def job_from_row(row):
+    job = dict(row)
+    job['reasons'] = json.loads(job['reasons'])
+    del job['start_after'], job['heartbeat']
+    return job
+
+
+class RetrainQueue:
+    """Runs retraining jobs one at a time across all workers, each in a child process
+
+    Jobs live in the retrain_jobs table, so every worker merges requests
+    into the same queued job and reports the same status. request() never
+    blocks: it queues a job that starts `delay` seconds after the latest
+    request, and requests arriving meanwhile are merged into it, so a burst
+    of edits trains once. A request during a run queues one follow-up job,
+    since the running snapshot may miss that edit. The first worker to
+    claim a due job while none is running starts the child, records its
+    epoch and loss, and calls on_publish() from its thread after a
+    checkpoint has been published (other workers pick the files up through
+    their model watcher). A job whose worker has not updated it for
+    stale_after seconds is marked failed. close() (registered with atexit
+    by the app) stops a running child.
+    """
+
+    def __init__(self, command, connection, on_publish=None, delay=5.0, history=10,
+                 poll_interval=1.0, progress_interval=0.5, stale_after=600):
+        self.command = command
+        self.connection = connection
+        self.on_publish = on_publish
+        self.delay = delay
+        self.history = history
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self.stale_after = stale_after
+        self._cond = threading.Condition()
+        self._thread = None
+        self._process = None
+        self._closed = False
+        self._woken = False
+
+    def request(self, reason=None):
+        """Queue a run (or join the queued one); returns the job"""
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            job_id = self._enqueue(conn, [reason] if reason else [], 1)
+            job = job_from_row(conn.execute('SELECT * FROM retrain_jobs WHERE id = ?', (job_id,)).fetchone())
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='retrain-queue', daemon=True)
+                self._thread.start()
+            self._woken = True
+            self._cond.notify()
+        return job
+
+    def status(self):
+        with self.connection() as conn:
+            running = conn.execute("SELECT * FROM retrain_jobs WHERE state = 'running' "
+                                   "ORDER BY id DESC LIMIT 1").fetchone()
+            queued = conn.execute("SELECT * FROM retrain_jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+            history = conn.execute("SELECT * FROM retrain_jobs WHERE state NOT IN ('queued', 'running') "
+                                   "ORDER BY id DESC LIMIT ?", (self.history,)).fetchall()
+            totals = conn.execute('SELECT state, COUNT(*) AS jobs, SUM(requests) AS requests '
+                                  'FROM retrain_jobs GROUP BY state').fetchall()
+        counts = dict.fromkeys(('requested', 'merged') + FINAL_STATES, 0)
+        for row in totals:
+            if row['state'] in FINAL_STATES:
+                counts[row['state']] = row['jobs']
+            if row['state'] != 'skipped':  # their requests were queued again
+                counts['requested'] += row['requests']
+                counts['merged'] += row['requests'] - row['jobs']
+        return {
+            'running': job_from_row(running) if running else None,
+            'queued': job_from_row(queued) if queued else None,
+            'history': [job_from_row(row) for row in history],
+            'counts': counts
+        }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def _enqueue(self, conn, reasons, requests):
+        """Merge into the queued job or insert one (inside BEGIN IMMEDIATE); its id"""
+        start_after = time.time() + self.delay
+        row = conn.execute("SELECT id, reasons FROM retrain_jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            return conn.execute('INSERT INTO retrain_jobs (state, requests, reasons, requested_at, start_after) '
+                                "VALUES ('queued', ?, ?, ?, ?)",
+                                (requests, json.dumps(reasons), datetime.now().isoformat(), start_after)).lastrowid
+        merged = json.loads(row['reasons'])
+        merged.extend(reason for reason in reasons if reason not in merged)
+        conn.execute('UPDATE retrain_jobs SET requests = requests + ?, reasons = ?, start_after = ? WHERE id = ?',
+                     (requests, json.dumps(merged), start_after, row['id']))
+        return row['id']
+
+    def _claim(self):
+        """(job, None) for a due job now marked running, else (None, seconds to wait; None = until woken)"""
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute("UPDATE retrain_jobs SET state = 'failed', finished_at = ?, message = ? "
+                         "WHERE state = 'running' AND heartbeat < ?",
+                         (datetime.now().isoformat(), 'The worker running this job stopped responding',
+                          now - self.stale_after))
+            if conn.execute("SELECT 1 FROM retrain_jobs WHERE state = 'running'").fetchone():
+                return None, self.poll_interval
+            row = conn.execute("SELECT * FROM retrain_jobs WHERE state = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None, None
+            if row['start_after'] > now:
+                return None, row['start_after'] - now
+            conn.execute("UPDATE retrain_jobs SET state = 'running', started_at = ?, heartbeat = ? WHERE id = ?",
+                         (datetime.now().isoformat(), now, row['id']))
+        return job_from_row(row), None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._woken = False
+            try:
+                job, wait = self._claim()
+            except Exception as e:
+                print(f"Error checking the retrain queue: {e}")
+                job, wait = None, self.poll_interval
+            if job is None:
+                with self._cond:
+                    if not self._closed and not self._woken:
+                        self._cond.wait(wait)
+                continue
+            state = self._execute(job)
+            if state == 'published' and self.on_publish is not None:
+                try:
+                    self.on_publish()
+                except Exception as e:
+                    print(f"Error after publishing retrained model: {e}")
+
+    def _execute(self, job):
+        """Run the child for a claimed job and record its outcome; the final state"""
+        output = deque(maxlen=20)
+        progress = {}
+        result = None
+        try:
+            process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       text=True, encoding='utf-8', errors='replace')
+        except OSError as e:
+            return self._finish(job, {'state': 'failed', 'message': str(e)})
+        with self._cond:
+            self._process = process
+        last_write = time.monotonic()
+        for line in process.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                event = None
+            if not isinstance(event, dict) or 'event' not in event:
+                output.append(line.rstrip())  # train.py logging or a traceback
+                continue
+            kind = event['event']
+            if kind == 'started':
+                progress['max_epochs'] = event.get('max_epochs')
+            elif kind == 'epoch':
+                progress.update(epoch=event['epoch'], loss=event['loss'])
+            elif kind in FINAL_STATES:
+                result = {key: event[key] for key in RESULT_FIELDS if key in event}
+                result['state'] = kind
+            if progress and time.monotonic() - last_write >= self.progress_interval:
+                self._progress(job, progress)
+                progress = {}
+                last_write = time.monotonic()
+        code = process.wait()
+        with self._cond:
+            self._process = None
+        if result is None:
+            message = next((line for line in reversed(output) if line), None)
+            result = {'state': 'failed', 'message': message or f'Training exited with code {code}'}
+        return self._finish(job, dict(progress, **result))
+
+    def _progress(self, job, fields):
+        try:
+            with self.connection() as conn:
+                self._update(conn, job, fields)
+        except Exception as e:
+            print(f"Error recording retrain progress: {e}")
+
+    def _finish(self, job, fields):
+        fields['finished_at'] = datetime.now().isoformat()
+        try:
+            with self.connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                self._update(conn, job, fields)
+                if fields['state'] == 'skipped':
+                    # Another run held the lock and may have missed these edits
+                    self._enqueue(conn, job['reasons'], job['requests'])
+                conn.execute("DELETE FROM retrain_jobs WHERE id <= ? AND state NOT IN ('queued', 'running')",
+                             (job['id'] - KEEP_JOBS,))
+        except Exception as e:
+            print(f"Error recording the outcome of retrain job {job['id']}: {e}")
+        return fields['state']
+
+    @staticmethod
+    def _update(conn, job, fields):
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        conn.execute(f'UPDATE retrain_jobs SET heartbeat = ?, {columns} WHERE id = ?',
+                     (time.time(), *fields.values(), job['id']))
+
+
+def main(argv=None):
+    from nltk_utils import TOKENIZERS
+
+    parser = argparse.ArgumentParser(description='Retrain the intent classifier and publish it if accuracy holds')
+    parser.add_argument('--intents', default=INTENTS_FILE)
+    parser.add_argument('--tokenizer', choices=sorted(TOKENIZERS), default=TOKENIZER_MODE)
+    args = parser.parse_args(argv)
+    try:
+        published = run(args.intents, tokenizer_mode=args.tokenizer)
+        return {True: 0, False: 2, None: 3}[published]
+    except Exception as e:
+        emit('failed', message=str(e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
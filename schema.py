@@ -0,0 +1,199 @@
+from analytics_rollups import create_schema as create_analytics_rollups
+from holiday_calendar import create_schema as create_holiday_calendar_schema
+from migrations import run_migrations
+from nltk_utils import normalize_question
+from retrain import create_schema as create_retrain_jobs
+from search import create_inquiry_search
+from session_store import create_schema as create_session_schema
+
+
+def create_tables(conn):
+    """Base tables; later changes go into MIGRATIONS"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS inquiries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT,
+            service TEXT NOT NULL,
+            message TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'new',
+            priority TEXT DEFAULT 'medium',
+            tags TEXT DEFAULT '',
+            notes TEXT DEFAULT '',
+            follow_up_date DATE,
+            assigned_to TEXT
+        )
+    ''')
+    
+    # Create conversation analytics table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS conversation_analytics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            user_message TEXT NOT NULL,
+            bot_response TEXT NOT NULL,
+            intent TEXT,
+            confidence REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            user_rating INTEGER,
+            detected_language TEXT,
+            response_time REAL
+        )
+    ''')
+    
+    # Create FAQ learning table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS faq_patterns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            original_question TEXT NOT NULL,
+            normalized_question TEXT NOT NULL,
+            intent TEXT NOT NULL,
+            frequency INTEGER DEFAULT 1,
+            last_asked DATETIME DEFAULT CURRENT_TIMESTAMP,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create admin users table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS admin_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    ''')
+    
+    # Create holidays table
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holidays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date DATE UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            description TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+# Per-intent FAQ totals for /admin/faq-insights, kept current by triggers on
+# faq_patterns instead of a GROUP BY over the whole table
+FAQ_ROLLUP_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS faq_intent_summary (
+        intent TEXT PRIMARY KEY,
+        pattern_count INTEGER NOT NULL,
+        total_asks INTEGER NOT NULL
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS faq_summary_insert AFTER INSERT ON faq_patterns BEGIN
+        INSERT INTO faq_intent_summary (intent, pattern_count, total_asks) VALUES (NEW.intent, 1, NEW.frequency)
+        ON CONFLICT(intent) DO UPDATE SET pattern_count = pattern_count + 1, total_asks = total_asks + NEW.frequency;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS faq_summary_update AFTER UPDATE OF intent, frequency ON faq_patterns BEGIN
+        UPDATE faq_intent_summary SET pattern_count = pattern_count - 1, total_asks = total_asks - OLD.frequency
+        WHERE intent = OLD.intent;
+        INSERT INTO faq_intent_summary (intent, pattern_count, total_asks) VALUES (NEW.intent, 1, NEW.frequency)
+        ON CONFLICT(intent) DO UPDATE SET pattern_count = pattern_count + 1, total_asks = total_asks + NEW.frequency;
+        DELETE FROM faq_intent_summary WHERE intent = OLD.intent AND pattern_count = 0;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS faq_summary_delete AFTER DELETE ON faq_patterns BEGIN
+        UPDATE faq_intent_summary SET pattern_count = pattern_count - 1, total_asks = total_asks - OLD.frequency
+        WHERE intent = OLD.intent;
+        DELETE FROM faq_intent_summary WHERE intent = OLD.intent AND pattern_count = 0;
+    END'''
+]
+
+
+def migrate_faq_patterns(conn):
+    """Give faq_patterns a unique normalized_question and its per-intent rollup
+
+    Existing rows are re-normalized and duplicates merged into the oldest
+    row before the unique index is created.
+    """
+    has_index = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_faq_patterns_normalized'"
+    ).fetchone()
+    if not has_index:
+        merged = {}
+        for row in conn.execute('SELECT * FROM faq_patterns ORDER BY id').fetchall():
+            key = normalize_question(row['original_question'])
+            if key not in merged:
+                merged[key] = dict(row, normalized_question=key)
+                continue
+            keep = merged[key]
+            keep['frequency'] += row['frequency']
+            if (row['last_asked'] or '') >= (keep['last_asked'] or ''):
+                keep['last_asked'] = row['last_asked']
+                keep['intent'] = row['intent']
+        conn.execute('DELETE FROM faq_patterns')
+        conn.executemany('''
+            INSERT INTO faq_patterns (id, original_question, normalized_question, intent, frequency, last_asked, created_at)
+            VALUES (:id, :original_question, :normalized_question, :intent, :frequency, :last_asked, :created_at)
+        ''', list(merged.values()))
+        conn.execute('CREATE UNIQUE INDEX idx_faq_patterns_normalized ON faq_patterns (normalized_question)')
+
+    has_rollup = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'faq_intent_summary'"
+    ).fetchone()
+    for statement in FAQ_ROLLUP_SCHEMA:
+        conn.execute(statement)
+    if not has_rollup:
+        rebuild_faq_summary(conn)
+
+
+def rebuild_faq_summary(conn):
+    """Recompute faq_intent_summary from faq_patterns (caller commits)"""
+    conn.execute('DELETE FROM faq_intent_summary')
+    conn.execute('''
+        INSERT INTO faq_intent_summary (intent, pattern_count, total_asks)
+        SELECT intent, COUNT(*), SUM(frequency) FROM faq_patterns GROUP BY intent
+    ''')
+
+
+# Indexes for the admin pages: inquiry filters by status/priority/service
+# ordered by timestamp, date-range counts per service, analytics grouped by
+# intent/language or ordered by timestamp, and the top FAQ list
+QUERY_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_inquiries_timestamp_service ON inquiries (timestamp, service)',
+    'CREATE INDEX IF NOT EXISTS idx_inquiries_status_timestamp ON inquiries (status, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_inquiries_priority_timestamp ON inquiries (priority, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_inquiries_service_timestamp ON inquiries (service, timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_analytics_timestamp ON conversation_analytics (timestamp)',
+    'CREATE INDEX IF NOT EXISTS idx_analytics_intent ON conversation_analytics (intent)',
+    'CREATE INDEX IF NOT EXISTS idx_analytics_language ON conversation_analytics (detected_language)',
+    'CREATE INDEX IF NOT EXISTS idx_analytics_rating ON conversation_analytics (user_rating) WHERE user_rating IS NOT NULL',
+    'CREATE INDEX IF NOT EXISTS idx_faq_patterns_frequency ON faq_patterns (frequency, last_asked)'
+]
+
+
+def add_query_indexes(conn):
+    for statement in QUERY_INDEXES:
+        conn.execute(statement)
+    conn.execute('ANALYZE')
+
+
+# The admin lists page by (timestamp, id); every index already ends in the
+# rowid, so a plain timestamp index serves the unfiltered inquiries list
+def add_keyset_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_inquiries_timestamp ON inquiries (timestamp)')
+    conn.execute('ANALYZE inquiries')
+
+
+# Schema changes after the base tables, applied in order and recorded in
+# PRAGMA user_version (see migrations.py). Append new versions; never edit old ones.
+MIGRATIONS = [
+    (1, migrate_faq_patterns),
+    (2, add_query_indexes),
+    (3, create_inquiry_search),
+    (4, add_keyset_indexes),
+    (5, create_analytics_rollups),
+    (6, create_retrain_jobs)
+]
+
+
+def create_schema(conn):
+    """Create all tables, triggers and indexes and apply pending migrations"""
+    create_tables(conn)
+    create_holiday_calendar_schema(conn)
+    create_session_schema(conn)
+    run_migrations(conn, MIGRATIONS)
@@ -0,0 +1,144 @@
+import re
+import sqlite3
+import threading
+
+SEARCH_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Characters stripped from phone numbers before indexing/lookup. The SQL
+# expression below is built from the same string, so both sides agree.
+PHONE_SEPARATORS = ' -+().'
+PHONE_KEY_SQL = 'phone'
+for _char in PHONE_SEPARATORS:
+    PHONE_KEY_SQL = f"REPLACE({PHONE_KEY_SQL}, '{_char}', '')"
+EMAIL_KEY_SQL = 'LOWER(TRIM(email))'
+
+# Shortest digit string / email fragment worth an exact-prefix lookup
+MIN_PHONE_DIGITS = 3
+MIN_EMAIL_PREFIX = 3
+
+# External-content FTS5 index over inquiries (no second copy of the text),
+# kept in sync by triggers, plus expression indexes for phone/email lookups
+INQUIRY_SEARCH_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS inquiries_fts USING fts5(
+        name, email, phone, message,
+        content='inquiries', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS inquiries_fts_insert AFTER INSERT ON inquiries BEGIN
+        INSERT INTO inquiries_fts (rowid, name, email, phone, message)
+        VALUES (NEW.id, NEW.name, NEW.email, NEW.phone, NEW.message);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS inquiries_fts_delete AFTER DELETE ON inquiries BEGIN
+        INSERT INTO inquiries_fts (inquiries_fts, rowid, name, email, phone, message)
+        VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.phone, OLD.message);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS inquiries_fts_update AFTER UPDATE OF name, email, phone, message ON inquiries BEGIN
+        INSERT INTO inquiries_fts (inquiries_fts, rowid, name, email, phone, message)
+        VALUES ('delete', OLD.id, OLD.name, OLD.email, OLD.phone, OLD.message);
+        INSERT INTO inquiries_fts (rowid, name, email, phone, message)
+        VALUES (NEW.id, NEW.name, NEW.email, NEW.phone, NEW.message);
+    END''',
+    f'CREATE INDEX IF NOT EXISTS idx_inquiries_phone_key ON inquiries ({PHONE_KEY_SQL})',
+    f'CREATE INDEX IF NOT EXISTS idx_inquiries_email_key ON inquiries ({EMAIL_KEY_SQL})'
+]
+
+
+def create_inquiry_search(conn):
+    """Create the search index and backfill it from the existing inquiries"""
+    for statement in INQUIRY_SEARCH_SCHEMA:
+        conn.execute(statement)
+    conn.execute("INSERT INTO inquiries_fts (inquiries_fts) VALUES ('rebuild')")
+
+
+def normalize_phone(text):
+    for char in PHONE_SEPARATORS:
+        text = text.replace(char, '')
+    return text
+
+
+def fts_query(text):
+    """User text -> FTS5 query; None if it has no words
+
+    Each space-separated term becomes a phrase whose last word matches as a
+    prefix, so 'anu@gmail' finds "anu" followed by "gmail..." and every term
+    must match somewhere.
+    """
+    phrases = []
+    for term in text.split():
+        words = SEARCH_TOKEN_PATTERN.findall(term)
+        if words:
+            phrases.append('"' + ' '.join(words) + '"*')
+    return ' '.join(phrases) or None
+
+
+def prefix_range(prefix):
+    # Everything starting with prefix sorts in [prefix, prefix + U+10FFFF)
+    return prefix, prefix + '\U0010ffff'
+
+
+def inquiry_search(text):
+    """SQL and params selecting (id, exact, rank) for inquiries matching text
+
+    Words are matched as prefixes through inquiries_fts and ranked with
+    bm25 (lower is better). A phone-like or email-like search also does an
+    exact-prefix lookup on the normalized phone/email indexes; those hits
+    get exact = 1 and sort first. Returns (None, []) if nothing is searchable.
+    """
+    parts = []
+    params = []
+    match = fts_query(text)
+    if match:
+        # The hidden rank column is bm25(); calling bm25() directly fails once
+        # SQLite flattens this into the GROUP BY below
+        parts.append('SELECT rowid AS id, 0 AS exact, rank FROM inquiries_fts WHERE inquiries_fts MATCH ?')
+        params.append(match)
+    phone = normalize_phone(text.strip())
+    if phone.isdigit() and len(phone) >= MIN_PHONE_DIGITS:
+        parts.append(f'SELECT id, 1, NULL FROM inquiries WHERE {PHONE_KEY_SQL} >= ? AND {PHONE_KEY_SQL} < ?')
+        params.extend(prefix_range(phone))
+    email = text.strip().lower()
+    if len(email) >= MIN_EMAIL_PREFIX and ' ' not in email and ('@' in email or '.' in email):
+        parts.append(f'SELECT id, 1, NULL FROM inquiries WHERE {EMAIL_KEY_SQL} >= ? AND {EMAIL_KEY_SQL} < ?')
+        params.extend(prefix_range(email))
+    if not parts:
+        return None, []
+    sql = f'SELECT id, MAX(exact) AS exact, MIN(rank) AS rank FROM ({" UNION ALL ".join(parts)}) GROUP BY id'
+    return sql, params
+
+
+class IntentSearchIndex:
+    """In-memory FTS5 index over intent tags, patterns and responses
+
+    Built once per set of intents (it lives in the ModelBundle), so the
+    training-data page searches with the same prefix matching and bm25
+    ranking as the inquiry search instead of scanning every string.
+    """
+
+    def __init__(self, intents_data):
+        self._conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute('''
+            CREATE VIRTUAL TABLE intents_fts USING fts5(
+                tag, patterns, responses,
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )
+        ''')
+        self.tags = [intent['tag'] for intent in intents_data['intents']]
+        self._conn.executemany(
+            'INSERT INTO intents_fts (rowid, tag, patterns, responses) VALUES (?, ?, ?, ?)',
+            [(i, intent['tag'], '\n'.join(intent['patterns']), '\n'.join(intent['responses']))
+             for i, intent in enumerate(intents_data['intents'])]
+        )
+
+    def search(self, text):
+        """Positions (in intents_data['intents']) of matching intents, best match first"""
+        match = fts_query(text)
+        if not match:
+            return []
+        with self._lock:
+            # Weight a tag hit above a pattern hit above a response hit
+            rows = self._conn.execute(
+                'SELECT rowid FROM intents_fts WHERE intents_fts MATCH ? ORDER BY bm25(intents_fts, 10.0, 5.0, 1.0)',
+                (match,)
+            ).fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,189 @@
+import json
+import threading
+import time
+
+from cache import LRUCache
+from conversation_context import ConversationContext
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        state TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_seen REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_seen ON chat_sessions (last_seen);
+    CREATE TABLE IF NOT EXISTS chat_turns (
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        message TEXT NOT NULL,
+        data TEXT,
+        timestamp TEXT NOT NULL,
+        PRIMARY KEY (session_id, seq)
+    ) WITHOUT ROWID;
+'''
+
+# Turn fields kept in their own columns; anything else goes into `data` as JSON
+TURN_COLUMNS = ('role', 'message', 'timestamp')
+
+
+def create_schema(conn):
+    conn.executescript(SCHEMA)
+
+
+def new_state():
+    return {'failed_attempts': 0, 'turns': 0, 'context': ConversationContext()}
+
+
+def encode_state(state):
+    return json.dumps(dict(state, context=state['context'].to_dict()))
+
+
+def decode_state(text):
+    state = json.loads(text)
+    state['context'] = ConversationContext.from_dict(state.get('context'))
+    return state
+
+
+def copy_state(state):
+    return decode_state(encode_state(state))
+
+
+class ConversationStore:
+    """Server-side chat sessions: a small state dict (failed attempts, turn
+    count and the ConversationContext) plus a ring buffer of turns
+
+    Only the opaque session id lives in the cookie. State and turns are
+    written through to SQLite; recently used states are also kept in an LRU
+    so a chat request reads nothing from disk. Each worker caches the
+    sessions it serves, so several workers need sticky sessions or a short
+    cache_ttl. Sessions idle for longer than idle_timeout seconds are
+    treated as new and purged by a background thread.
+    """
+
+    def __init__(self, connection, max_turns=50, idle_timeout=86400, cache_size=1024,
+                 cache_ttl=None, purge_interval=600):
+        self.connection = connection
+        self.max_turns = max_turns
+        self.idle_timeout = idle_timeout
+        self.purge_interval = purge_interval
+        self.cache = LRUCache(cache_size, cache_ttl or idle_timeout)
+        self.purged = 0
+
+    def _expired(self, last_seen, now):
+        return self.idle_timeout and now - last_seen > self.idle_timeout
+
+    def load(self, session_id):
+        """Current state for a session; a fresh one if unknown or expired
+
+        Returns a copy, so a request's changes only reach the cache through
+        save() and are dropped if it fails.
+        """
+        now = time.time()
+        entry = self.cache.get(session_id)
+        if entry is None:
+            with self.connection() as conn:
+                row = conn.execute('SELECT state, last_seen FROM chat_sessions WHERE session_id = ?',
+                                   (session_id,)).fetchone()
+            if row is None or self._expired(row['last_seen'], now):
+                entry = {'state': new_state(), 'last_seen': now}
+            else:
+                entry = {'state': decode_state(row['state']), 'last_seen': row['last_seen']}
+            self.cache.set(session_id, entry)
+        elif self._expired(entry['last_seen'], now):
+            return new_state()
+        return copy_state(entry['state'])
+
+    def save(self, session_id, state, turns=()):
+        """Write state and append turns in one transaction, trimming to max_turns
+
+        Sequence numbers are taken from chat_turns under BEGIN IMMEDIATE, so
+        concurrent requests on one session (two tabs, a double submit, two
+        workers) append after each other instead of colliding, and the
+        cached state only changes once the transaction has committed. Two
+        concurrent requests each change their own copy from load(); the
+        later save wins the state, but both turns are kept.
+        """
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT last_seen FROM chat_sessions WHERE session_id = ?',
+                               (session_id,)).fetchone()
+            if row is None or self._expired(row['last_seen'], now):
+                # New or expired session: drop turns left from a previous one
+                conn.execute('DELETE FROM chat_turns WHERE session_id = ?', (session_id,))
+            seq = conn.execute('SELECT COALESCE(MAX(seq) + 1, 0) FROM chat_turns WHERE session_id = ?',
+                               (session_id,)).fetchone()[0]
+            rows = []
+            for turn in turns:
+                data = {key: value for key, value in turn.items() if key not in TURN_COLUMNS}
+                rows.append((session_id, seq, turn['role'], turn['message'],
+                             json.dumps(data) if data else None, turn['timestamp']))
+                seq += 1
+            if rows:
+                conn.executemany('INSERT INTO chat_turns (session_id, seq, role, message, data, timestamp) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)', rows)
+                conn.execute('DELETE FROM chat_turns WHERE session_id = ? AND seq < ?',
+                             (session_id, seq - self.max_turns))
+            encoded = encode_state(dict(state, turns=seq))
+            conn.execute('INSERT INTO chat_sessions (session_id, state, created_at, last_seen) VALUES (?, ?, ?, ?) '
+                         'ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, last_seen = excluded.last_seen',
+                         (session_id, encoded, now, now))
+        state['turns'] = seq
+        # Cache its own copy; the caller's state stays private to its request
+        self.cache.set(session_id, {'state': decode_state(encoded), 'last_seen': now})
+
+    def history(self, session_id, before=None, limit=20):
+        """Up to `limit` turns older than sequence number `before`, oldest first,
+        and the cursor for the page before them (None at the start)"""
+        with self.connection() as conn:
+            if before is None:
+                rows = conn.execute('SELECT * FROM chat_turns WHERE session_id = ? ORDER BY seq DESC LIMIT ?',
+                                    (session_id, limit)).fetchall()
+            else:
+                rows = conn.execute('SELECT * FROM chat_turns WHERE session_id = ? AND seq < ? '
+                                    'ORDER BY seq DESC LIMIT ?', (session_id, before, limit)).fetchall()
+        turns = []
+        for row in reversed(rows):
+            turn = {'seq': row['seq'], 'role': row['role'], 'message': row['message'], 'timestamp': row['timestamp']}
+            if row['data']:
+                turn.update(json.loads(row['data']))
+            turns.append(turn)
+        cursor = turns[0]['seq'] if len(rows) == limit and turns[0]['seq'] > 0 else None
+        return turns, cursor
+
+    def delete(self, session_id):
+        with self.connection() as conn:
+            conn.execute('DELETE FROM chat_turns WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM chat_sessions WHERE session_id = ?', (session_id,))
+        self.cache.pop(session_id)
+
+    def purge_expired(self):
+        """Delete sessions idle for longer than idle_timeout; returns how many"""
+        if not self.idle_timeout:
+            return 0
+        cutoff = time.time() - self.idle_timeout
+        with self.connection() as conn:
+            conn.execute('DELETE FROM chat_turns WHERE session_id IN '
+                         '(SELECT session_id FROM chat_sessions WHERE last_seen < ?)', (cutoff,))
+            count = conn.execute('DELETE FROM chat_sessions WHERE last_seen < ?', (cutoff,)).rowcount
+        self.purged += count
+        return count
+
+    def watch(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                self.purge_expired()
+            except Exception as e:
+                print(f"Error purging chat sessions: {e}")
+
+    def start(self):
+        """Start the background purge (no-op when purge_interval is falsy)"""
+        if self.purge_interval:
+            threading.Thread(target=self.watch, name='session-purge', daemon=True).start()
+
+    def stats(self):
+        return {'cache': self.cache.stats(), 'max_turns': self.max_turns,
+                'idle_timeout': self.idle_timeout, 'purged': self.purged}
@@ -0,0 +1,174 @@
+import functools
+import os
+import re
+from collections import Counter
+
+from cache import LRUCache
+from nltk_utils import stem
+
+# Words are only corrected into the vocabulary; anything else (numbers,
+# names in other scripts, emails) is left alone
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+# Edit distance allowed by word length: short words get fewer edits so that
+# e.g. "car" or "bus" are not pulled onto an unrelated vocabulary word
+MIN_CORRECTION_LENGTH = 4
+LONG_WORD_LENGTH = 6
+MAX_EDIT_DISTANCE = 2
+
+# Common English words, never corrected: a real word that is simply not in
+# the intent vocabulary ("parking", "monday") is not a misspelling
+ENGLISH_WORDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'english_words.txt')
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (Levenshtein plus adjacent swaps),
+    or limit + 1 as soon as it is known to exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and j > 1 and a[i - 1] == b[j - 2]
+                    and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def deletes(word, distance):
+    """All strings reachable from word by removing up to `distance` characters"""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+@functools.lru_cache(maxsize=None)
+def load_word_list(path=ENGLISH_WORDS_FILE):
+    """Words of a one-per-line list ('#' starts a comment line); empty if the file is missing"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return frozenset(line.strip() for line in f if line.strip() and not line.startswith('#'))
+    except FileNotFoundError:
+        return frozenset()
+
+
+def vocabulary_counts(intents, extra_words=(), all_words=None):
+    """Word frequencies from intent patterns, the raw words behind all_words
+
+    With the model's all_words, only words whose stem the model knows are
+    kept, so nothing is corrected into a word the classifier ignores.
+    """
+    counts = Counter()
+    for intent in intents['intents']:
+        for pattern in intent['patterns']:
+            counts.update(WORD_PATTERN.findall(pattern.lower()))
+    if all_words is not None:
+        known_stems = set(all_words)
+        counts = Counter({w: c for w, c in counts.items() if stem(w) in known_stems})
+    counts.update(extra_words)
+    return counts
+
+
+class SpellCorrector:
+    """SymSpell-style corrector over a fixed vocabulary
+
+    Every vocabulary word is indexed under each string obtained by deleting
+    up to MAX_EDIT_DISTANCE characters. A misspelling is looked up by its
+    own deletions, so candidates within the edit distance come from a few
+    dictionary hits instead of a scan of the vocabulary; only those are
+    checked with the real distance. Ties go to the more frequent word.
+    Words in known_words (valid English) are left alone.
+    """
+
+    def __init__(self, counts, overrides=None, known_words=(), max_distance=MAX_EDIT_DISTANCE, cache_size=4096):
+        self.max_distance = max_distance
+        self.counts = {w: c for w, c in counts.items() if len(w) >= 2}
+        self.overrides = dict(overrides or {})
+        self.known_words = frozenset(known_words)
+        self.index = {}
+        for word in self.counts:
+            for variant in deletes(word, max_distance):
+                self.index.setdefault(variant, []).append(word)
+        self.cache = LRUCache(cache_size) if cache_size else None
+
+    @classmethod
+    def from_intents(cls, intents, overrides=None, all_words=None, known_words=None, **kwargs):
+        """Corrector over the pattern words the model knows (all words if
+        all_words is None), leaving the English word list alone by default"""
+        overrides = overrides or {}
+        if known_words is None:
+            known_words = load_word_list()
+        return cls(vocabulary_counts(intents, overrides.values(), all_words), overrides, known_words, **kwargs)
+
+    def allowed_distance(self, word):
+        if len(word) < MIN_CORRECTION_LENGTH:
+            return 0
+        if len(word) < LONG_WORD_LENGTH:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup(self, word):
+        """Best vocabulary word within the allowed distance, or word itself"""
+        if word in self.overrides:
+            return self.overrides[word]
+        if word in self.counts or word in self.known_words or not WORD_PATTERN.fullmatch(word):
+            return word
+        limit = self.allowed_distance(word)
+        if not limit:
+            return word
+
+        best, best_key = word, None
+        seen = set()
+        for variant in deletes(word, limit):
+            for candidate in self.index.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                distance = edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+                key = (distance, -self.counts[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+        return best
+
+    def correct(self, word):
+        """Cached lookup()"""
+        if self.cache is None:
+            return self.lookup(word)
+        corrected = self.cache.get(word)
+        if corrected is None:
+            corrected = self.lookup(word)
+            self.cache.set(word, corrected)
+        return corrected
+
+    def correct_message(self, message):
+        """Lowercase message with each word corrected, keeping surrounding punctuation"""
+        corrected_words = []
+        for word in message.lower().split():
+            clean_word = word.strip('.,!?;:')
+            if clean_word:
+                corrected = self.correct(clean_word)
+                if corrected != clean_word:
+                    word = word.replace(clean_word, corrected)
+            corrected_words.append(word)
+        return ' '.join(corrected_words)
+
+    def stats(self):
+        stats = {'vocabulary': len(self.counts), 'index_keys': len(self.index), 'known_words': len(self.known_words)}
+        if self.cache is not None:
+            stats['cache'] = self.cache.stats()
+        return stats
@@ -1,67 +1,96 @@
-import numpy as np
-import random
+"""Train the intent classifier and export it
+
+Usage: python train.py [--mode loader|batch] [--epochs N] [--batch-size N]
+                       [--lr LR] [--val-split F] [--patience N] [--seed N]
+
+--mode loader (default) is the original loop: a DataLoader over the
+patterns with batch_size 8. --mode batch keeps the whole dataset as one
+tensor on the device, shuffles index slices instead of using a
+DataLoader (batch size 0 = full batch) and stops once the monitored loss
+has not improved by --min-delta for --patience epochs, keeping the best
+weights. With --val-split a stratified part of the patterns is held out to
+pick that epoch count, then the saved model is refit on all patterns for
+it. Both modes report wall-clock time per epoch.
+"""
+import argparse
 import json
+import os
+import random
+import time
 
+import numpy as np
 import torch
 import torch.nn as nn
 from torch.utils.data import Dataset, DataLoader
 
-from nltk_utils import bag_of_words, tokenize, stem
+from nltk_utils import BagOfWords, tokenize, stem
 from model import NeuralNet
+from export_model import export_numpy_bundle
+
+INTENTS_FILE = 'kalapuraparambil_intents.json'
+FILE = "kalapuraparambil_data.pth"
+NUMPY_FILE = "kalapuraparambil_data.npz"
+
+IGNORE_WORDS = ['?', '.', '!']
+HIDDEN_SIZE = 8
+
+
+def load_training_data(intents_path=INTENTS_FILE):
+    """Vocabulary, tags and the (X, y) arrays for every pattern in the intents file"""
+    with open(intents_path, 'r', encoding='utf-8') as f:
+        return build_training_data(json.load(f))
+
+
+def build_training_data(intents):
+    """Vocabulary, tags and the (X, y) arrays for every pattern in loaded intents"""
+    all_words = []
+    tags = []
+    xy = []
+    for intent in intents['intents']:
+        tag = intent['tag']
+        tags.append(tag)
+        for pattern in intent['patterns']:
+            w = tokenize(pattern)
+            all_words.extend(w)
+            xy.append((w, tag))
+
+    all_words = sorted(set(stem(w) for w in all_words if w not in IGNORE_WORDS))
+    tags = sorted(set(tags))
+
+    # Fill the whole matrix with one scatter instead of a vector per pattern
+    featurizer = BagOfWords(all_words)
+    tag_index = {tag: i for i, tag in enumerate(tags)}
+    rows = []
+    cols = []
+    for i, (pattern_sentence, _) in enumerate(xy):
+        active = featurizer.indices(pattern_sentence)
+        rows.extend([i] * len(active))
+        cols.extend(active)
+    X = np.zeros((len(xy), len(all_words)), dtype=np.float32)
+    X[rows, cols] = 1
+    y = np.array([tag_index[tag] for _, tag in xy], dtype=np.int64)
+    return all_words, tags, X, y
+
+
+def validation_split(y, fraction, seed=0):
+    """(train, validation) index arrays holding out `fraction` of each tag's
+    patterns; every tag keeps at least one pattern for training"""
+    rng = np.random.default_rng(seed)
+    train_idx = []
+    val_idx = []
+    for label in np.unique(y):
+        idx = rng.permutation(np.flatnonzero(y == label))
+        n_val = min(int(round(len(idx) * fraction)), len(idx) - 1)
+        val_idx.extend(idx[:n_val])
+        train_idx.extend(idx[n_val:])
+    return np.sort(np.array(train_idx, dtype=np.int64)), np.sort(np.array(val_idx, dtype=np.int64))
+
 
-# Load the Kalapuraparambil Automobiles intents
-with open('kalapuraparambil_intents.json', 'r', encoding='utf-8') as f:
-    intents = json.load(f)
-
-all_words = []
-tags = []
-xy = []
-
-for intent in intents['intents']:
-    tag = intent['tag']
-    tags.append(tag)
-    for pattern in intent['patterns']:
-        w = tokenize(pattern)
-        all_words.extend(w)
-        xy.append((w, tag))
-
-ignore_words = ['?', '.', '!']
-all_words = [stem(w) for w in all_words if w not in ignore_words]
-all_words = sorted(set(all_words))
-tags = sorted(set(tags))
-
-print(len(xy), "patterns")
-print(len(tags), "tags:", tags)
-print(len(all_words), "unique stemmed words:", all_words)
-
-# Create training data
-X_train = []
-y_train = []
-for (pattern_sentence, tag) in xy:
-    bag = bag_of_words(pattern_sentence, all_words)
-    X_train.append(bag)
-    label = tags.index(tag)
-    y_train.append(label)
-
-X_train = np.array(X_train)
-y_train = np.array(y_train)
-
-# Hyper-parameters
-num_epochs = 1000
-batch_size = 8
-learning_rate = 0.001
-input_size = len(X_train[0])
-hidden_size = 8
-output_size = len(tags)
-print(input_size, output_size)
-
-
-# Storing state of the model in database
 class ChatDataset(Dataset):
-    def __init__(self):
-        self.n_samples = len(X_train)
-        self.x_data = X_train
-        self.y_data = y_train
+    def __init__(self, X, y):
+        self.n_samples = len(X)
+        self.x_data = X
+        self.y_data = y
 
     def __getitem__(self, index):
         return self.x_data[index], self.y_data[index]
@@ -70,50 +99,208 @@ class ChatDataset(Dataset):
         return self.n_samples
 
 
-dataset = ChatDataset()
-train_loader = DataLoader(dataset=dataset,
-                          batch_size=batch_size,
-                          shuffle=True,
-                          num_workers=0)
+def train_loader(model, X, y, device, num_epochs=1000, batch_size=8, learning_rate=0.001,
+                 log_every=100, on_epoch=None):
+    """The original DataLoader loop; returns the training history"""
+    train_loader = DataLoader(dataset=ChatDataset(X, y),
+                              batch_size=batch_size,
+                              shuffle=True,
+                              num_workers=0)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
 
-device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    start = time.perf_counter()
+    for epoch in range(num_epochs):
+        for (words, labels) in train_loader:
+            words = words.to(device)
+            labels = labels.to(dtype=torch.long).to(device)
 
-model = NeuralNet(input_size, hidden_size, output_size).to(device)
+            # Forward pass
+            outputs = model(words)
+            loss = criterion(outputs, labels)
 
-# Loss and optimizer
-criterion = nn.CrossEntropyLoss()
-optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+            # Backward and optimize
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
 
-# Train the model
-for epoch in range(num_epochs):
-    for (words, labels) in train_loader:
-        words = words.to(device)
-        labels = labels.to(dtype=torch.long).to(device)
+        if on_epoch is not None:
+            on_epoch(epoch + 1, loss.item(), None)
+        if (epoch + 1) % log_every == 0:
+            ms = (time.perf_counter() - start) / (epoch + 1) * 1000
+            print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {loss.item():.4f}, {ms:.2f} ms/epoch')
 
-        # Forward pass
-        outputs = model(words)
-        loss = criterion(outputs, labels)
+    seconds = time.perf_counter() - start
+    history = {'epochs': num_epochs, 'seconds': seconds, 'ms_per_epoch': seconds / max(num_epochs, 1) * 1000}
+    X = torch.from_numpy(X).to(device)
+    y = torch.from_numpy(y).to(device)
+    history['loss'], history['accuracy'] = evaluate(model, X, y, criterion)
+    return history
 
-        # Backward and optimize
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
 
-    if (epoch + 1) % 100 == 0:
-        print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {loss.item():.4f}')
+def evaluate(model, X, y, criterion):
+    model.eval()
+    with torch.no_grad():
+        outputs = model(X)
+        loss = criterion(outputs, y).item()
+        accuracy = (outputs.argmax(dim=1) == y).float().mean().item()
+    model.train()
+    return loss, accuracy
 
-print(f'final loss: {loss.item():.4f}')
 
-data = {
-    "model_state": model.state_dict(),
-    "input_size": input_size,
-    "hidden_size": hidden_size,
-    "output_size": output_size,
-    "all_words": all_words,
-    "tags": tags
-}
+def train_batches(model, X, y, device, X_val=None, y_val=None, num_epochs=1000, batch_size=0,
+                  learning_rate=0.01, patience=50, min_delta=1e-4, log_every=100, on_epoch=None):
+    """Vectorized loop over shuffled index slices of one on-device tensor
+
+    Monitors the validation loss when a validation set is given, else the
+    epoch's training loss, and stops after `patience` epochs without an
+    improvement of at least min_delta (patience 0 never stops early). The
+    best weights are restored at the end. Returns the training history.
+    """
+    X = torch.from_numpy(X).to(device)
+    y = torch.from_numpy(y).to(device)
+    has_val = X_val is not None and len(X_val) > 0
+    if has_val:
+        X_val = torch.from_numpy(X_val).to(device)
+        y_val = torch.from_numpy(y_val).to(device)
+    n = len(X)
+    batch_size = batch_size or n
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+
+    best_loss = float('inf')
+    best_state = None
+    best_epoch = 0
+    val_loss = None
+    epoch = -1  # stays -1 when num_epochs is 0
+    start = time.perf_counter()
+    for epoch in range(num_epochs):
+        perm = torch.randperm(n, device=device)
+        total = 0.0
+        for i in range(0, n, batch_size):
+            idx = perm[i:i + batch_size]
+            outputs = model(X[idx])
+            loss = criterion(outputs, y[idx])
+
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(idx)
+        epoch_loss = total / n
+
+        if has_val:
+            val_loss, _ = evaluate(model, X_val, y_val, criterion)
+        monitored = val_loss if has_val else epoch_loss
+        if monitored < best_loss - min_delta:
+            best_loss = monitored
+            best_epoch = epoch + 1
+            best_state = {name: tensor.detach().clone() for name, tensor in model.state_dict().items()}
+
+        if on_epoch is not None:
+            on_epoch(epoch + 1, epoch_loss, val_loss)
+        if (epoch + 1) % log_every == 0:
+            ms = (time.perf_counter() - start) / (epoch + 1) * 1000
+            val = f', Val loss: {val_loss:.4f}' if has_val else ''
+            print(f'Epoch [{epoch + 1}/{num_epochs}], Loss: {epoch_loss:.4f}{val}, {ms:.2f} ms/epoch')
+        if patience and epoch + 1 - best_epoch >= patience:
+            print(f'Stopping early at epoch {epoch + 1}: no improvement since epoch {best_epoch}')
+            break
+
+    seconds = time.perf_counter() - start
+    epochs = epoch + 1
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    history = {'epochs': epochs, 'best_epoch': best_epoch, 'seconds': seconds,
+               'ms_per_epoch': seconds / max(epochs, 1) * 1000}
+    history['loss'], history['accuracy'] = evaluate(model, X, y, criterion)
+    if has_val:
+        history['val_loss'], history['val_accuracy'] = evaluate(model, X_val, y_val, criterion)
+    return history
+
+
+def save_checkpoint(model, all_words, tags, path=FILE):
+    data = {
+        "model_state": model.state_dict(),
+        "input_size": len(all_words),
+        "hidden_size": model.l1.out_features,
+        "output_size": len(tags),
+        "all_words": all_words,
+        "tags": tags
+    }
+    # Write to a temporary file first so a running app never loads a partial checkpoint
+    torch.save(data, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Train the intent classifier and export it')
+    parser.add_argument('--mode', choices=['loader', 'batch'], default='loader')
+    parser.add_argument('--epochs', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='default 8 for loader, 0 (full batch) for batch mode')
+    parser.add_argument('--lr', type=float, default=None, help='default 0.001 for loader, 0.01 for batch mode')
+    parser.add_argument('--val-split', type=float, default=0.0, help='batch mode: fraction of patterns held out')
+    parser.add_argument('--patience', type=int, default=50, help='batch mode: 0 disables early stopping')
+    parser.add_argument('--min-delta', type=float, default=1e-4)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--intents', default=INTENTS_FILE)
+    parser.add_argument('--output', default=FILE)
+    parser.add_argument('--numpy-output', default=NUMPY_FILE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None, on_epoch=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+        torch.manual_seed(args.seed)
+
+    start = time.perf_counter()
+    all_words, tags, X, y = load_training_data(args.intents)
+    print(len(X), "patterns")
+    print(len(tags), "tags:", tags)
+    print(len(all_words), "unique stemmed words:", all_words)
+    print(f'dataset built in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = NeuralNet(len(all_words), HIDDEN_SIZE, len(tags)).to(device)
+
+    if args.mode == 'loader':
+        batch_size = 8 if args.batch_size is None else args.batch_size
+        learning_rate = 0.001 if args.lr is None else args.lr
+        history = train_loader(model, X, y, device, args.epochs, batch_size, learning_rate, on_epoch=on_epoch)
+    else:
+        batch_size = 0 if args.batch_size is None else args.batch_size
+        learning_rate = 0.01 if args.lr is None else args.lr
+        train_idx, val_idx = validation_split(y, args.val_split, seed=args.seed or 0)
+        history = train_batches(model, X[train_idx], y[train_idx], device, X[val_idx], y[val_idx],
+                                args.epochs, batch_size, learning_rate, args.patience, args.min_delta,
+                                on_epoch=on_epoch)
+        if len(val_idx):
+            print(f'{history["epochs"]} epochs in {history["seconds"]:.2f} s ({history["ms_per_epoch"]:.2f} ms/epoch)')
+            print(f'validation loss {history["val_loss"]:.4f}, accuracy {history["val_accuracy"]:.1%}')
+            # The held-out patterns were only used to pick the epoch count; the
+            # saved model is refit on every pattern for that many epochs
+            refit_epochs = max(history['best_epoch'], 1)
+            print(f'refitting on all {len(X)} patterns for {refit_epochs} epochs')
+            model = NeuralNet(len(all_words), HIDDEN_SIZE, len(tags)).to(device)
+            refit = train_batches(model, X, y, device, num_epochs=refit_epochs, batch_size=batch_size,
+                                  learning_rate=learning_rate, patience=0, on_epoch=on_epoch)
+            history.update(loss=refit['loss'], accuracy=refit['accuracy'], refit_epochs=refit['epochs'],
+                           seconds=history['seconds'] + refit['seconds'])
+            history['ms_per_epoch'] = history['seconds'] / max(history['epochs'] + refit['epochs'], 1) * 1000
+
+    print(f'final loss: {history["loss"]:.4f}, accuracy {history["accuracy"]:.1%}')
+    if 'refit_epochs' not in history:
+        print(f'{history["epochs"]} epochs in {history["seconds"]:.2f} s ({history["ms_per_epoch"]:.2f} ms/epoch)')
+
+    save_checkpoint(model, all_words, tags, args.output)
+    print(f'training complete. file saved to {args.output}')
+
+    export_numpy_bundle(args.output, args.numpy_output)
+    return history
 
-FILE = "kalapuraparambil_data.pth"
-torch.save(data, FILE)
 
-print(f'training complete. file saved to {FILE}')
\ No newline at end of file
+if __name__ == '__main__':
+    main()